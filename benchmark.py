@@ -0,0 +1,354 @@
+from argparse import ArgumentParser
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import linter
+
+# Множители размеров входных данных. Каждый следующий размер вдвое больше 
+# предыдущего, поэтому при линейной сложности время этапа растёт примерно 
+# вдвое, а при квадратичной — вчетверо
+SCALES = (1, 2, 4)
+# Этапы короче этого времени (в секундах) не сравниваются: их замеры 
+# слишком сильно зависят от шума
+MIN_DURATION = 0.0002
+
+
+# Измерения входных данных: базовые параметры генератора исходного кода и 
+# параметр, который увеличивается с множителем размера
+DIMENSIONS = {
+    'imports': ({'imports': 250}, 'imports'),
+    'comments': ({'imports': 50, 'comment_lines': 10}, 'comment_lines'),
+    'names': ({'imports': 50, 'names_per_line': 20}, 'names_per_line'),
+    'modules': ({'imports': 50, 'modules_per_line': 20}, 'modules_per_line'),
+    'size': ({'imports': 20, 'code_lines': 20000}, 'code_lines'),
+    'files': ({'files': 20}, 'files')
+}
+
+
+def generate_source(
+    imports: int = 20,
+    comment_lines: int = 0,
+    names_per_line: int = 1,
+    modules_per_line: int = 1,
+    code_lines: int = 200
+) -> str:
+    '''
+    Генерирует исходный код с разделом импортов в обратном порядке (чтобы 
+    линтеру было что реорганизовать) и кодом после него. Чётные строки 
+    раздела — импорты модулей, нечётные — импорты из модулей. Перед каждым 
+    импортом ставится блок комментариев заданной длины, каждая пятая строка 
+    кода длиннее 79 знаков
+    '''
+    lines = []
+    for idx in reversed(range(imports)):
+        lines.extend(
+            f'# Комментарий {line} к импорту {idx}' \
+                for line in range(comment_lines)
+        )
+        if idx % 2:
+            names = ', '.join(
+                f'name_{idx}_{name}' \
+                    for name in reversed(range(names_per_line))
+            )
+            lines.append(f'from package_{idx} import {names}')
+        else:
+            modules = ', '.join(
+                f'module_{idx}_{module}' \
+                    for module in reversed(range(modules_per_line))
+            )
+            lines.append(f'import {modules}')
+    lines.extend(['', ''])
+    for idx in range(code_lines):
+        if idx % 5:
+            lines.append(f'value_{idx} = {idx}')
+        else:
+            lines.append(f'value_{idx} = "{"x" * 80}"  # {idx}')
+    return '\n'.join(lines) + '\n'
+
+
+def time_stages(source: str, filepath: str) -> dict:
+    '''
+    Проверяет исходный код по этапам и возвращает словарь, где ключ — 
+    название этапа, а значение — время его выполнения в секундах. Каждый 
+    этап получает результат предыдущего, как при обычной проверке
+    '''
+    timings = {}
+
+    def timed(stage: str, function, *args):
+        start = time.perf_counter()
+        result = function(*args)
+        timings[stage] = time.perf_counter() - start
+        return result
+
+    file_lines = linter.get_file_lines(source)
+    timed('section_bounds', linter._get_import_section_bounds, file_lines)
+    import_lines, start_index, end_index = timed(
+        'commentaries',
+        linter.get_import_lines_with_indices_and_comments,
+        file_lines
+    )
+    import_records = timed(
+        'import_records',
+        linter._get_import_records,
+        import_lines
+    )
+    timed('duplicates', linter._check_duplicates, import_records)
+    new_lines = timed('reorganize', linter._reorganize_order, import_records)
+    timed(
+        'edit_script',
+        linter._get_edit_script,
+        file_lines,
+        new_lines,
+        start_index,
+        end_index
+    )
+    timed(
+        'long_lines',
+        lambda: list(linter._iter_long_lines(filepath, 79))
+    )
+    return timings
+
+
+def time_files(filepaths: list, source: str) -> dict:
+    '''
+    Проверяет файлы с помощью lint_files в текущем процессе без кэша и 
+    возвращает время проверки в секундах. Перед проверкой файлы 
+    перезаписываются исходным кодом, так как проверка исправляет их
+    '''
+    for filepath in filepaths:
+        linter.write_file(filepath, source)
+    start = time.perf_counter()
+    linter.lint_files(filepaths, imports=True, max_line_length=79, jobs=1)
+    return {'lint_files': time.perf_counter() - start}
+
+
+def run_dimension(
+    dimension: str,
+    scale: float = 1.0,
+    repeats: int = 5
+) -> dict:
+    '''
+    Измеряет время этапов для каждого множителя размера из SCALES. 
+    Возвращает словарь, где ключ — название этапа, а значение — список 
+    лучших из repeats замеров (в секундах) для каждого множителя
+    '''
+    base_parameters, parameter = DIMENSIONS[dimension]
+    timings = {}
+    with tempfile.TemporaryDirectory() as temp_directory:
+        for factor in SCALES:
+            parameters = dict(base_parameters)
+            parameters[parameter] = max(
+                int(parameters[parameter] * scale * factor),
+                1
+            )
+            files = parameters.pop('files', None)
+            source = generate_source(**parameters)
+            filepaths = [
+                os.path.join(temp_directory, f'module_{idx}.py') \
+                    for idx in range(files or 1)
+            ]
+            if files is None:
+                linter.write_file(filepaths[0], source)
+            best_timings = {}
+            for _ in range(repeats):
+                if files is None:
+                    current_timings = time_stages(source, filepaths[0])
+                else:
+                    current_timings = time_files(filepaths, source)
+                for stage, duration in current_timings.items():
+                    best_timings[stage] = min(
+                        best_timings.get(stage, duration),
+                        duration
+                    )
+            for stage, duration in best_timings.items():
+                timings.setdefault(stage, []).append(duration)
+    return timings
+
+
+def time_import(module: str, repeats: int = 5) -> float:
+    '''
+    Импортирует модуль в отдельных процессах с параметром -X importtime и 
+    возвращает лучшее из repeats совокупное время импорта в секундах
+    '''
+    best_duration = None
+    for _ in range(repeats):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        for line in result.stderr.splitlines():
+            if line.endswith(f'| {module}'):
+                # Совокупное время импорта модуля в микросекундах
+                duration = int(line.split('|')[1]) / 1_000_000
+                best_duration = min(best_duration or duration, duration)
+    return best_duration
+
+
+def get_growth(durations: list) -> float:
+    '''
+    Возвращает средний рост времени этапа при удвоении размера входных 
+    данных: около 2 для линейной сложности и около 4 для квадратичной
+    '''
+    if durations[0] <= 0:
+        return 0.0
+    return (durations[-1] / durations[0]) ** (1 / (len(durations) - 1))
+
+
+def check_results(
+    results: dict,
+    max_growth: float,
+    baseline: dict | None = None,
+    threshold: float = 0.25
+) -> list:
+    '''
+    Возвращает список описаний проблем: этапов, время которых растёт 
+    быстрее max_growth при удвоении размера, и этапов, которые на 
+    наибольшем размере медленнее базовых замеров больше чем на threshold
+    '''
+    problems = []
+    for dimension, timings in results.items():
+        for stage, durations in timings.items():
+            if durations[-1] < MIN_DURATION:
+                continue
+            growth = get_growth(durations)
+            if growth > max_growth:
+                problems.append(
+                    f'{dimension}/{stage}: рост времени {growth:.2f} '
+                    f'при удвоении размера (допустимо {max_growth:.2f})'
+                )
+            baseline_duration = (baseline or {}).get(dimension, {}).get(stage)
+            if baseline_duration and \
+                durations[-1] > baseline_duration * (1 + threshold):
+                problems.append(
+                    f'{dimension}/{stage}: {durations[-1] * 1000:.2f} мс '
+                    f'вместо {baseline_duration * 1000:.2f} мс по базовым '
+                    'замерам'
+                )
+    return problems
+
+
+def main(argv: list | None = None) -> int:
+    '''
+    Запускает замеры из командной строки и возвращает код завершения: 1, 
+    если найдены проблемы, иначе 0
+    '''
+    parser = ArgumentParser(
+        prog='Linter benchmark',
+        description='Замеры времени этапов линтера на синтетических данных'
+    )
+    parser.add_argument(
+        'dimensions',
+        nargs='*',
+        help='Измерения входных данных: '
+        f'{", ".join(DIMENSIONS)} (по умолчанию все)'
+    )
+    parser.add_argument(
+        '--scale',
+        type=float,
+        default=1.0,
+        help='Множитель базовых размеров входных данных (по умолчанию 1)'
+    )
+    parser.add_argument(
+        '--repeats',
+        type=int,
+        default=5,
+        help='Количество повторов, из которых берётся лучший замер '
+        '(по умолчанию 5)'
+    )
+    parser.add_argument(
+        '--max-growth',
+        type=float,
+        default=3.0,
+        help='Допустимый рост времени этапа при удвоении размера входных '
+        'данных (по умолчанию 3)'
+    )
+    parser.add_argument(
+        '--max-import-ratio',
+        type=float,
+        default=3.0,
+        help='Допустимое отношение времени импорта линтера ко времени '
+        'импорта модуля logging (по умолчанию 3)'
+    )
+    parser.add_argument(
+        '--baseline',
+        help='JSON файл с базовыми замерами для сравнения'
+    )
+    parser.add_argument(
+        '--threshold',
+        type=float,
+        default=0.25,
+        help='Допустимое замедление по сравнению с базовыми замерами в '
+        'долях (по умолчанию 0.25)'
+    )
+    parser.add_argument(
+        '--save-baseline',
+        help='Сохранить замеры на наибольшем размере в JSON файл как базовые'
+    )
+    args = parser.parse_args(argv)
+    for dimension in args.dimensions:
+        if dimension not in DIMENSIONS:
+            parser.error(f'Неизвестное измерение: {dimension}')
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+    results = {}
+    for dimension in args.dimensions or DIMENSIONS:
+        results[dimension] = run_dimension(
+            dimension,
+            args.scale,
+            args.repeats
+        )
+        print(f'{dimension}:')
+        for stage, durations in results[dimension].items():
+            durations_string = ' '.join(
+                f'{duration * 1000:10.3f}' for duration in durations
+            )
+            print(
+                f'  {stage:<16}{durations_string} мс  '
+                f'рост {get_growth(durations):.2f}'
+            )
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as file:
+            json.dump(
+                {
+                    dimension: {
+                        stage: durations[-1] \
+                            for stage, durations in timings.items()
+                    } for dimension, timings in results.items()
+                },
+                file,
+                indent=4
+            )
+    problems = check_results(
+        results,
+        args.max_growth,
+        baseline,
+        args.threshold
+    )
+    # Время импорта сравнивается с импортом logging, который линтер 
+    # загружает в любом случае, поэтому замер не зависит от скорости машины
+    logging_import_time = time_import('logging', args.repeats)
+    linter_import_time = time_import('linter', args.repeats)
+    print(
+        f'import: linter {linter_import_time * 1000:.3f} мс, '
+        f'logging {logging_import_time * 1000:.3f} мс'
+    )
+    if linter_import_time > logging_import_time * args.max_import_ratio:
+        problems.append(
+            f'import: {linter_import_time * 1000:.2f} мс, больше чем в '
+            f'{args.max_import_ratio:.2f} раза дольше импорта logging'
+        )
+    for problem in problems:
+        print(problem, file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
\ No newline at end of file
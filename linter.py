@@ -1,11 +1,24 @@
-from argparse import ArgumentParser
-import importlib.util
+from collections.abc import Callable, Iterator
+from collections import namedtuple
+from contextlib import nullcontext
+from functools import cache
+import io
 import logging
 from logging import LogRecord
 import os
 from pathlib import Path
-import re
 import sys
+from typing import TYPE_CHECKING
+
+# Тяжёлые модули импортируются только для аннотаций, при выполнении они 
+# загружаются в функциях по мере необходимости
+if TYPE_CHECKING:
+    from argparse import ArgumentParser
+    import mmap
+
+
+__version__ = '1.1.0'
+
 
 # Создаём класс для присваивания цветов логам
 class ColourFormatter(logging.Formatter):
@@ -18,44 +31,1101 @@ class ColourFormatter(logging.Formatter):
 
     def format(self, record: LogRecord) -> str:
         log_color = self.COLOURS.get(record.levelname, self.RESET)
-        record.msg = f'{log_color}{record.msg}{self.RESET}'
-        return super().format(record)
+        # Запись лога не изменяется, так как её могут выводить и другие 
+        # обработчики
+        return f'{log_color}{super().format(record)}{self.RESET}'
+
+
+# Диагностика проверки: правило, уровень лога, номер строки в файле (если 
+# диагностика относится к строке) и сообщение
+Diagnostic = namedtuple('Diagnostic', ['rule', 'level', 'line', 'message'])
+
+
+# Разобранная строка импорта: исходная строка и её номер в файле, строка 
+# импорта для раздела импортов, верхнеуровневый модуль, комментарии над 
+# строкой, импортируемые элементы в виде кортежей (имя, псевдоним), модуль 
+# "from"-импорта, отформатированный строчный комментарий, признак 
+# "from"-импорта и ключ сортировки строки внутри группы импортов
+ImportRecord = namedtuple('ImportRecord', [
+    'initial_string',
+    'initial_string_index',
+    'import_string',
+    'module_name',
+    'full_line_commentaries',
+    'names',
+    'from_module',
+    'inline_comment',
+    'is_from',
+    'sort_key'
+])
+
+
+# Результат проверки исходного кода: список диагностик, исходный код после 
+# исправлений и признак того, что исправления изменили код
+Result = namedtuple('Result', ['diagnostics', 'source', 'is_changed'])
+
+
+# Ошибка, из-за которой невозможно исправить раздел импортов. Содержит 
+# диагностики с описанием всех найденных проблем
+class LinterError(Exception):
+
+    def __init__(self, diagnostics: list) -> None:
+        super().__init__(
+            '\n'.join(diagnostic.message for diagnostic in diagnostics)
+        )
+        self.diagnostics = diagnostics
+
+
+# Кэш результатов проверки файлов в базе данных SQLite. Ключ записи состоит 
+# из хэша содержимого файла, версии линтера и параметров проверки, значение 
+# записи — диагностики проверки. При превышении допустимого количества записей 
+# удаляются записи, которые дольше всего не использовались. Ошибки при 
+# работе с базой данных не прерывают проверку, кэш в этом случае просто 
+# не используется
+class ResultsCache:
+    FILENAME = 'results.sqlite3'
+
+    def __init__(self, cache_dir: str | Path) -> None:
+        import sqlite3
+
+        self.new_records = {}
+        self.used_keys = []
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            self.connection = sqlite3.connect(
+                os.path.join(cache_dir, self.FILENAME),
+                timeout=60
+            )
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS results ('
+                'key TEXT PRIMARY KEY, '
+                'records TEXT NOT NULL, '
+                'last_used REAL NOT NULL)'
+            )
+            self.connection.execute(
+                'CREATE INDEX IF NOT EXISTS results_last_used '
+                'ON results (last_used)'
+            )
+        except (OSError, sqlite3.Error):
+            self.connection = None
+
+    def get(self, key: str) -> list | None:
+        records = self.get_records(key)
+        if records is not None:
+            return [Diagnostic(*record) for record in records]
+
+    def get_records(self, key: str) -> list | None:
+        import json
+        import sqlite3
+
+        if not self.connection:
+            return
+        try:
+            row = self.connection.execute(
+                'SELECT records FROM results WHERE key = ?',
+                (key,)
+            ).fetchone()
+        except sqlite3.Error:
+            return
+        if row:
+            self.used_keys.append(key)
+            return json.loads(row[0])
+
+    def add(self, key: str, records: list) -> None:
+        self.new_records[key] = records
+
+    def flush(self) -> None:
+        import json
+        import sqlite3
+        import time
+
+        if not self.connection:
+            return
+        now = time.time()
+        try:
+            with self.connection:
+                self.connection.executemany(
+                    'INSERT OR REPLACE INTO results VALUES (?, ?, ?)',
+                    [
+                        (key, json.dumps(records), now) \
+                            for key, records in self.new_records.items()
+                    ]
+                )
+                self.connection.executemany(
+                    'UPDATE results SET last_used = ? WHERE key = ?',
+                    [(now, key) for key in self.used_keys]
+                )
+        except sqlite3.Error:
+            pass
+        self.new_records = {}
+        self.used_keys = []
+
+    def evict(self, max_entries: int) -> None:
+        import sqlite3
+
+        if not self.connection:
+            return
+        try:
+            with self.connection:
+                self.connection.execute(
+                    'DELETE FROM results WHERE key IN ('
+                    'SELECT key FROM results ORDER BY last_used DESC '
+                    'LIMIT -1 OFFSET ?)',
+                    (max_entries,)
+                )
+        except sqlite3.Error:
+            pass
+
+    def close(self) -> None:
+        if self.connection:
+            self.connection.close()
+
+
+# Языковой сервер (LSP), обменивающийся сообщениями JSON-RPC через 
+# стандартные потоки ввода-вывода. Хранит открытые документы и результаты их 
+# последней проверки, поэтому повторные запросы для неизменённого документа 
+# не требуют новой проверки, а классификация модулей запоминается на всё 
+# время работы сервера
+class LanguageServer:
+    SEVERITIES = {
+        logging.ERROR: 1,
+        logging.WARNING: 2,
+        logging.INFO: 3
+    }
+
+    def __init__(
+        self,
+        input_stream: io.BufferedIOBase,
+        output_stream: io.BufferedIOBase,
+        imports: bool = True,
+        max_line_length: int | None = None,
+        rules: list | None = None
+    ) -> None:
+        self.input_stream = input_stream
+        self.output_stream = output_stream
+        self.imports = imports
+        self.max_line_length = max_line_length
+        self.rules = rules
+        self.documents = {}
+        self.results = {}
+        self.handlers = {
+            'initialize': self.initialize,
+            'shutdown': self.shutdown,
+            'textDocument/didOpen': self.did_open,
+            'textDocument/didChange': self.did_change,
+            'textDocument/didSave': self.did_save,
+            'textDocument/didClose': self.did_close,
+            'textDocument/formatting': self.formatting
+        }
+
+    def serve(self) -> None:
+        while True:
+            try:
+                message = self.read_message()
+            except ValueError as error:
+                # Сообщение, которое не удалось разобрать, пропускается, а 
+                # идентификатор запроса в нём неизвестен
+                self.send_message({
+                    'id': None,
+                    'error': {
+                        'code': -32700,
+                        'message': f'Не удалось разобрать сообщение: {error}'
+                    }
+                })
+                continue
+            if message is None or message.get('method') == 'exit':
+                return
+            self.handle_message(message)
+
+    def read_message(self) -> dict | None:
+        import json
+
+        content_length = 0
+        while True:
+            header = self.input_stream.readline()
+            if not header:
+                return
+            if not header.strip():
+                break
+            name, _, value = header.decode('ascii').partition(':')
+            if name.strip().lower() == 'content-length':
+                content_length = int(value)
+        message = json.loads(self.input_stream.read(content_length))
+        if not isinstance(message, dict):
+            raise ValueError('сообщение должно быть объектом JSON')
+        return message
+
+    def send_message(self, message: dict) -> None:
+        import json
+
+        message['jsonrpc'] = '2.0'
+        body = json.dumps(message, ensure_ascii=False).encode('utf-8')
+        self.output_stream.write(
+            b'Content-Length: %d\r\n\r\n' % len(body) + body
+        )
+        self.output_stream.flush()
+
+    def handle_message(self, message: dict) -> None:
+        method = message.get('method')
+        handler = self.handlers.get(method)
+        if 'id' not in message:
+            # Уведомление, ответ не требуется
+            if handler:
+                try:
+                    handler(message.get('params') or {})
+                except Exception as error:
+                    logger.error(f'Ошибка обработки "{method}": {error}')
+            return
+        if not method:
+            # Ответ клиента на запрос сервера
+            return
+        if not handler:
+            self.send_message({
+                'id': message['id'],
+                'error': {
+                    'code': -32601,
+                    'message': f'Метод не поддерживается: {method}'
+                }
+            })
+            return
+        try:
+            result = handler(message.get('params') or {})
+        except Exception as error:
+            self.send_message({
+                'id': message['id'],
+                'error': {'code': -32603, 'message': str(error)}
+            })
+            return
+        self.send_message({'id': message['id'], 'result': result})
+
+    def initialize(self, params: dict) -> dict:
+        return {
+            'capabilities': {
+                'textDocumentSync': {
+                    'openClose': True,
+                    'change': 1,
+                    'save': {'includeText': True}
+                },
+                'documentFormattingProvider': True
+            },
+            'serverInfo': {'name': 'linter', 'version': __version__}
+        }
+
+    def shutdown(self, params: dict) -> None:
+        self.documents = {}
+        self.results = {}
+
+    def did_open(self, params: dict) -> None:
+        text_document = params['textDocument']
+        self.documents[text_document['uri']] = text_document['text']
+        self.publish_diagnostics(text_document['uri'])
+
+    def did_change(self, params: dict) -> None:
+        uri = params['textDocument']['uri']
+        # Используется полная синхронизация: последнее изменение содержит 
+        # весь текст документа
+        self.documents[uri] = params['contentChanges'][-1]['text']
+        self.publish_diagnostics(uri)
+
+    def did_save(self, params: dict) -> None:
+        uri = params['textDocument']['uri']
+        if 'text' in params:
+            self.documents[uri] = params['text']
+        self.publish_diagnostics(uri)
+
+    def did_close(self, params: dict) -> None:
+        uri = params['textDocument']['uri']
+        self.documents.pop(uri, None)
+        self.results.pop(uri, None)
+        self.send_message({
+            'method': 'textDocument/publishDiagnostics',
+            'params': {'uri': uri, 'diagnostics': []}
+        })
+
+    def formatting(self, params: dict) -> list:
+        uri = params['textDocument']['uri']
+        result = self.get_result(uri)
+        if not result.is_changed:
+            return []
+        text = self.documents[uri]
+        last_line = text.rsplit('\n', 1)[-1]
+        return [
+            {
+                'range': {
+                    'start': {'line': 0, 'character': 0},
+                    'end': {
+                        'line': text.count('\n'),
+                        'character': len(last_line.encode('utf-16-le')) // 2
+                    }
+                },
+                'newText': result.source
+            }
+        ]
+
+    def get_result(self, uri: str) -> Result:
+        text = self.documents[uri]
+        cached_text, result = self.results.get(uri, (None, None))
+        if cached_text != text:
+            result = lint_source(
+                text,
+                self.imports,
+                self.max_line_length,
+                rules=self.rules
+            )
+            self.results[uri] = (text, result)
+        return result
+
+    def publish_diagnostics(self, uri: str) -> None:
+        result = self.get_result(uri)
+        file_lines = get_file_lines(self.documents[uri])
+        diagnostics = [
+            (
+                diagnostic.line,
+                self.SEVERITIES.get(diagnostic.level, 1),
+                diagnostic.rule,
+                diagnostic.message
+            ) for diagnostic in result.diagnostics if diagnostic.line
+        ]
+        if result.is_changed:
+            # Отмечаем первую строку, которую изменит реорганизация импортов
+            fixed_file_lines = get_file_lines(result.source)
+            line_number = 1
+            while line_number <= len(file_lines) and \
+                line_number <= len(fixed_file_lines) and \
+                file_lines[line_number - 1] == \
+                    fixed_file_lines[line_number - 1]:
+                line_number += 1
+            diagnostics.append((
+                min(line_number, len(file_lines)),
+                2,
+                'import-order',
+                'Раздел импортов не соответствует PEP8'
+            ))
+        lsp_diagnostics = []
+        for line_number, severity, rule, message in diagnostics:
+            line = file_lines[line_number - 1] if file_lines else ''
+            lsp_diagnostics.append({
+                'range': {
+                    'start': {'line': line_number - 1, 'character': 0},
+                    'end': {
+                        'line': line_number - 1,
+                        'character': len(line.encode('utf-16-le')) // 2
+                    }
+                },
+                'severity': severity,
+                'code': rule,
+                'source': 'linter',
+                'message': message
+            })
+        self.send_message({
+            'method': 'textDocument/publishDiagnostics',
+            'params': {'uri': uri, 'diagnostics': lsp_diagnostics}
+        })
+
+
+# Профиль проверки файлов: для каждого файла и этапа проверки (чтение, 
+# разбиение на строки, поиск раздела импортов, разбор импортов, проверка 
+# повторений, классификация модулей, сортировка, расстановка пустых строк, 
+# запись) хранятся суммарное время, количество вызовов и пик выделенной 
+# памяти (по данным tracemalloc). Этапы могут быть вложенными: время и 
+# память вложенного этапа входят в показатели внешнего
+class Profile:
+    PHASE_ORDER = (
+        'read',
+        'split',
+        'line_length',
+        'verify',
+        'section',
+        'parse',
+        'duplicates',
+        'reorder',
+        'classify',
+        'spacing',
+        'write'
+    )
+
+    def __init__(self, trace_memory: bool = True) -> None:
+        import time
+
+        self.files = {}
+        self.rules = {}
+        self.imports_memo = {'hits': 0, 'disk_hits': 0, 'misses': 0}
+        self.module_index = None
+        self.trace_memory = trace_memory
+        self._clock = time.perf_counter
+        self._phases = self.files.setdefault(None, {})
+        self._stack = []
+        self._next_phase = None
+
+    def start_file(self, filepath: str) -> None:
+        '''
+        Начинает учёт этапов проверки файла
+        '''
+        self._phases = self.files.setdefault(filepath, {})
+
+    def phase(self, name: str) -> 'Profile':
+        '''
+        Возвращает контекстный менеджер для учёта этапа проверки
+        '''
+        self._next_phase = name
+        return self
+
+    def add_rule(self, name: str, duration: float, calls: int) -> None:
+        '''
+        Добавляет время и количество вызовов правила
+        '''
+        rule = self.rules.setdefault(name, {'time': 0.0, 'calls': 0})
+        rule['time'] += duration
+        rule['calls'] += calls
+
+    def __enter__(self) -> None:
+        import tracemalloc
+
+        memory = 0
+        if self.trace_memory and tracemalloc.is_tracing():
+            memory, peak = tracemalloc.get_traced_memory()
+            # Пик внешнего этапа сохраняется до сброса пика для текущего
+            if self._stack:
+                self._stack[-1][3] = max(self._stack[-1][3], peak)
+            tracemalloc.reset_peak()
+        self._stack.append([self._next_phase, self._clock(), memory, 0])
+
+    def __exit__(self, *exc_info) -> None:
+        import tracemalloc
+
+        name, start, memory, peak = self._stack.pop()
+        duration = self._clock() - start
+        if self.trace_memory and tracemalloc.is_tracing():
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            if self._stack:
+                self._stack[-1][3] = max(self._stack[-1][3], peak)
+        phase = self._phases.setdefault(
+            name,
+            {'time': 0.0, 'calls': 0, 'peak_memory': 0}
+        )
+        phase['time'] += duration
+        phase['calls'] += 1
+        phase['peak_memory'] = max(phase['peak_memory'], peak - memory)
+
+    def to_dict(self) -> dict:
+        '''
+        Возвращает профиль в виде словаря для вывода в JSON: этапы каждого 
+        файла, суммарные показатели этапов по всем файлам, время и 
+        количество вызовов каждого правила, количество попаданий и промахов 
+        памяти разделов импортов и статистику классификации модулей 
+        (количество обращений к индексу модулей, размер индекса и время его 
+        создания)
+        '''
+        total = {}
+        files = {}
+        for filepath, phases in sorted(
+            self.files.items(),
+            key=lambda x: (x[0] is not None, x[0] or '')
+        ):
+            for name, phase in phases.items():
+                total_phase = total.setdefault(
+                    name,
+                    {'time': 0.0, 'calls': 0, 'peak_memory': 0}
+                )
+                total_phase['time'] += phase['time']
+                total_phase['calls'] += phase['calls']
+                total_phase['peak_memory'] = max(
+                    total_phase['peak_memory'],
+                    phase['peak_memory']
+                )
+            if filepath is not None:
+                files[filepath] = self._sort_phases(phases)
+        module_classification = {
+            'calls': total.get('classify', {'calls': 0})['calls']
+        }
+        if self.module_index:
+            module_classification['index_modules'] = \
+                len(self.module_index.third_party) + \
+                len(self.module_index.first_party)
+            module_classification['index_build_time'] = \
+                self.module_index.build_time
+        return {
+            'files': files,
+            'total': self._sort_phases(total),
+            'rules': dict(sorted(self.rules.items())),
+            'imports_memo': dict(self.imports_memo),
+            'module_classification': module_classification
+        }
+
+    def _sort_phases(self, phases: dict) -> dict:
+        '''
+        Упорядочивает этапы в порядке их выполнения при проверке
+        '''
+        return {
+            name: phases[name] for name in sorted(
+                phases,
+                key=lambda x: self.PHASE_ORDER.index(x) \
+                    if x in self.PHASE_ORDER else len(self.PHASE_ORDER)
+            )
+        }
+
+
+# Отчёт о результатах проверки. Диагностики накапливаются в виде компактных 
+# записей (путь к файлу, правило, уровень, строка, сообщение) и выводятся 
+# одной операцией записи в выбранном формате: текст, строки JSON или SARIF. 
+# Текст выделяется цветом, только если вывод идёт в терминал
+class Reporter:
+    FORMATS = ('text', 'json', 'sarif')
+    LEVELS = {
+        logging.INFO: ('info', 'note'),
+        logging.WARNING: ('warning', 'warning'),
+        logging.ERROR: ('error', 'error')
+    }
+
+    def __init__(
+        self,
+        output_format: str = 'text',
+        stream: io.TextIOBase | None = None,
+        max_line_length: int | None = None
+    ) -> None:
+        if output_format not in self.FORMATS:
+            raise ValueError(f'Неизвестный формат отчёта: {output_format}')
+        self.output_format = output_format
+        self.stream = stream or sys.stdout
+        self.max_line_length = max_line_length
+        self.colour = self.stream.isatty()
+        self.filepaths = []
+        self.records = []
+
+    def add_results(self, results: list) -> None:
+        '''
+        Добавляет в отчёт результаты проверки: список кортежей (путь к 
+        файлу, диагностики)
+        '''
+        for filepath, diagnostics in results:
+            self.filepaths.append(filepath)
+            self.records.extend(
+                (filepath, *diagnostic) for diagnostic in diagnostics
+            )
+
+    def flush(self) -> None:
+        '''
+        Выводит накопленный отчёт и очищает его
+        '''
+        if self.output_format == 'json':
+            contents = self._get_json_lines()
+        elif self.output_format == 'sarif':
+            contents = self._get_sarif()
+        else:
+            contents = self._get_text()
+        if contents:
+            self.stream.write(contents)
+            self.stream.flush()
+        self.filepaths = []
+        self.records = []
+
+    def _get_text(self) -> str:
+        '''
+        Возвращает отчёт в текстовом виде, как его выводили логи линтера
+        '''
+        lines = []
+        records = iter(self.records)
+        record = next(records, None)
+        for filepath in self.filepaths:
+            if len(self.filepaths) > 1:
+                lines.append(
+                    self._colourize(logging.INFO, f'Файл: {filepath}')
+                )
+            if self.max_line_length:
+                lines.append(self._colourize(
+                    logging.INFO,
+                    'Проверка, есть ли строки, которые '
+                    f'содержат более {self.max_line_length} знаков'
+                ))
+            # Записи добавляются в том же порядке, что и файлы
+            while record is not None and record[0] == filepath:
+                lines.append(self._colourize(record[2], record[4]))
+                record = next(records, None)
+        return ''.join(line + '\n' for line in lines)
+
+    def _colourize(self, level: int, message: str) -> str:
+        '''
+        Выделяет сообщение цветом уровня, если вывод идёт в терминал
+        '''
+        if not self.colour:
+            return message
+        colour = ColourFormatter.COLOURS.get(
+            logging.getLevelName(level),
+            ColourFormatter.RESET
+        )
+        return f'{colour}{message}{ColourFormatter.RESET}'
+
+    def _get_json_lines(self) -> str:
+        '''
+        Возвращает отчёт в виде строк JSON, по одной на диагностику
+        '''
+        import json
+
+        encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+        return ''.join(
+            encoder.encode({
+                'path': filepath,
+                'rule': rule,
+                'level': self.LEVELS.get(level, self.LEVELS[logging.INFO])[0],
+                'line': line,
+                'message': message
+            }) + '\n' for filepath, rule, level, line, message in self.records
+        )
+
+    def _get_sarif(self) -> str:
+        '''
+        Возвращает отчёт в формате SARIF 2.1.0
+        '''
+        import json
+
+        results = []
+        rules = {}
+        for filepath, rule, level, line, message in self.records:
+            rules.setdefault(rule, {'id': rule})
+            physical_location = {
+                'artifactLocation': {'uri': Path(filepath).as_posix()}
+            }
+            if line is not None:
+                physical_location['region'] = {'startLine': line}
+            results.append({
+                'ruleId': rule,
+                'level': self.LEVELS.get(level, self.LEVELS[logging.INFO])[1],
+                'message': {'text': message.strip()},
+                'locations': [{'physicalLocation': physical_location}]
+            })
+        sarif = {
+            '$schema': 'https://json.schemastore.org/sarif-2.1.0.json',
+            'version': '2.1.0',
+            'runs': [{
+                'tool': {
+                    'driver': {
+                        'name': 'Linter',
+                        'version': __version__,
+                        'rules': list(rules.values())
+                    }
+                },
+                'results': results
+            }]
+        }
+        return json.dumps(sarif, ensure_ascii=False) + '\n'
+
+
+# Индекс верхнеуровневых модулей окружения Python, по которому модули 
+# классифицируются без поиска в файловой системе при каждом импорте. 
+# Сторонние модули берутся из метаданных установленных дистрибутивов 
+# (top_level.txt, а если его нет — RECORD) и из содержимого директорий 
+# site-packages, модули проекта — из корневых директорий исходного кода. 
+# Стандартные модули определяются по списку модулей текущего интерпретатора
+class ModuleIndex:
+
+    def __init__(
+        self,
+        site_packages: list | None = None,
+        source_roots: list | None = None
+    ) -> None:
+        import time
+
+        start = time.perf_counter()
+        if site_packages is None:
+            site_packages = [
+                path for path in sys.path \
+                    if 'site-packages' in path or 'dist-packages' in path
+            ]
+        if source_roots is None:
+            source_roots = [os.getcwd(), os.path.join(os.getcwd(), 'src')]
+        self.third_party = self._get_distributions_modules(site_packages)
+        for path in site_packages:
+            self.third_party.update(self._get_directory_modules(path))
+        self.first_party = set()
+        for path in source_roots:
+            self.first_party.update(self._get_directory_modules(path))
+        self.fingerprint = None
+        self.build_time = time.perf_counter() - start
+
+    @classmethod
+    def from_environment(
+        cls,
+        environment: str,
+        source_roots: list | None = None
+    ) -> 'ModuleIndex':
+        '''
+        Создаёт индекс для виртуального окружения (или другой установки 
+        Python) по пути к нему. Вызывает ValueError, если в окружении нет 
+        директорий site-packages
+        '''
+        import glob
+
+        site_packages = sorted(
+            glob.glob(
+                os.path.join(environment, 'lib*', 'python3*', '*-packages')
+            ) + glob.glob(os.path.join(environment, 'Lib', 'site-packages'))
+        )
+        if not site_packages:
+            raise ValueError(
+                f'Не найдены директории site-packages окружения: {environment}'
+            )
+        return cls(site_packages, source_roots)
+
+    def classify(self, module_name: str) -> str:
+        '''
+        Возвращает группу модуля: "standard" (стандартные и встроенные 
+        модули), "third_party" (сторонние модули) или "local" (модули 
+        проекта и модули, которых нет в окружении)
+        '''
+        if module_name in sys.stdlib_module_names or \
+            module_name in sys.builtin_module_names:
+            return 'standard'
+        if module_name in self.third_party and \
+            module_name not in self.first_party:
+            return 'third_party'
+        return 'local'
+
+    def get_fingerprint(self) -> str:
+        '''
+        Возвращает хэш содержимого индекса для ключей кэша результатов. Хэш 
+        вычисляется один раз
+        '''
+        import hashlib
+
+        if self.fingerprint is None:
+            self.fingerprint = hashlib.sha256(
+                (
+                    ','.join(sorted(self.third_party)) + ';' + \
+                        ','.join(sorted(self.first_party))
+                ).encode('utf-8')
+            ).hexdigest()[:16]
+        return self.fingerprint
+
+    @staticmethod
+    def _get_directory_modules(path: str) -> set:
+        '''
+        Возвращает имена модулей и пакетов, которые находятся в директории
+        '''
+        modules = set()
+        try:
+            entries = os.scandir(path)
+        except OSError:
+            return modules
+        with entries:
+            for entry in entries:
+                name = entry.name
+                if name.endswith(('.py', '.pyd', '.so')):
+                    name = name.split('.')[0]
+                elif not entry.is_dir():
+                    continue
+                if name.isidentifier() and name != '__pycache__':
+                    modules.add(name)
+        return modules
+
+    @staticmethod
+    def _get_distributions_modules(site_packages: list) -> set:
+        '''
+        Возвращает имена верхнеуровневых модулей установленных 
+        дистрибутивов по их метаданным. RECORD разбирается напрямую, без 
+        проверки существования каждого перечисленного в нём файла
+        '''
+        import csv
+        from importlib.metadata import distributions
+
+        modules = set()
+        for distribution in distributions(path=site_packages):
+            top_level = distribution.read_text('top_level.txt')
+            if top_level:
+                modules.update(
+                    name.replace('/', '.').split('.')[0] \
+                        for name in top_level.split()
+                )
+                continue
+            record = distribution.read_text('RECORD') or ''
+            for row in csv.reader(record.splitlines()):
+                parts = row[0].split('/') if row else []
+                if len(parts) > 1:
+                    name = parts[0]
+                elif parts and parts[0].endswith(('.py', '.pyd', '.so')):
+                    name = parts[0].split('.')[0]
+                else:
+                    continue
+                if name.isidentifier() and name != '__pycache__':
+                    modules.add(name)
+        return modules
+
+
+# Правило проверки исходного кода. Правило может проверять каждую строку 
+# файла (check_line) и раздел импортов (check_import_section). Методы 
+# правил вызываются движком RuleEngine, который проходит по строкам файла 
+# один раз. Правила, доступные по имени, перечислены в RULES
+class Rule:
+    name = ''
+
+    def check_line(self, line_number: int, line: str) -> Diagnostic | None:
+        '''
+        Возвращает диагностику строки или ничего, если строка корректна
+        '''
+
+    def check_import_section(
+        self,
+        file_lines: list,
+        import_section_bounds: tuple | None
+    ) -> tuple:
+        '''
+        Проверяет раздел импортов (индексы его начала и конца или ничего, 
+        если раздела импортов нет) и возвращает список диагностик и 
+        исправленные строки файла (или ничего, если исправлять нечего)
+        '''
+        return [], None
+
 
+# Правило проверки длины строк
+class LineLengthRule(Rule):
+    name = 'line-length'
 
-# Выставляются настройки логирования
+    def __init__(self, max_length: int = 79) -> None:
+        self.max_length = max_length
+
+    def check_line(self, line_number: int, line: str) -> Diagnostic | None:
+        if len(line) > self.max_length:
+            return _get_line_length_diagnostic(line_number, line)
+
+
+# Правило реорганизации раздела импортов согласно PEP8
+class ImportOrderRule(Rule):
+    name = 'import-order'
+
+    def check_import_section(
+        self,
+        file_lines: list,
+        import_section_bounds: tuple | None
+    ) -> tuple:
+        if import_section_bounds is None:
+            return [Diagnostic(
+                'no-import-section',
+                logging.WARNING,
+                None,
+                'Раздела импортов не обнаружено'
+            )], None
+        try:
+            fixed_file_lines = _fix_import_section(
+                file_lines,
+                import_section_bounds
+            )
+        except LinterError as error:
+            return error.diagnostics, None
+        if fixed_file_lines is file_lines:
+            return [], None
+        return [], fixed_file_lines
+
+
+# Движок правил. Проходит по строкам файла один раз: передаёт каждую строку 
+# правилам строк и одновременно определяет границы раздела импортов, 
+# которые после прохода передаются правилам раздела импортов. Если правил 
+# строк нет, проход завершается на первой строке кода. Для каждого правила 
+# ведётся учёт времени и количества вызовов, если включено профилирование
+class RuleEngine:
+
+    def __init__(self, rules: list) -> None:
+        self.rules = rules
+        self.line_rules = [
+            rule for rule in rules \
+                if type(rule).check_line is not Rule.check_line
+        ]
+        self.section_rules = [
+            rule for rule in rules \
+                if type(rule).check_import_section \
+                is not Rule.check_import_section
+        ]
+        self.timings = {}
+
+    def run(
+        self,
+        source: str,
+        changed_lines: list | None = None
+    ) -> Result:
+        '''
+        Проверяет исходный код всеми правилами и возвращает результат 
+        проверки. Если передан список диапазонов изменённых строк, то 
+        диагностики строк выдаются только для изменённых строк, а правила 
+        раздела импортов вызываются, только если изменения затронули начало 
+        файла до первой строки кода
+        '''
+        diagnostics = []
+        with _phase('split'):
+            file_lines = get_file_lines(source)
+        line_checks = [
+            self._get_check(rule, rule.check_line) for rule in self.line_rules
+        ]
+        scan_section = bool(self.section_rules)
+        start_index = None
+        last_import_index = None
+        with _phase('line_length') if line_checks else _no_phase:
+            for line_number, line in enumerate(file_lines, 1):
+                if scan_section:
+                    # Раздел импортов определяется так же, как в 
+                    # _get_import_section_bounds
+                    if line.startswith('import') or line.startswith('from'):
+                        if start_index is None:
+                            start_index = line_number - 1
+                        last_import_index = line_number - 1
+                    elif not line.startswith('#') and line.strip() != '':
+                        scan_section = False
+                        if not line_checks:
+                            break
+                for line_check in line_checks:
+                    diagnostic = line_check(line_number, line)
+                    if diagnostic and \
+                        _is_line_changed(line_number, changed_lines):
+                        diagnostics.append(diagnostic)
+        import_section_bounds = None
+        if start_index is not None:
+            import_section_bounds = (start_index, last_import_index + 1)
+        section_rules = self.section_rules
+        if changed_lines is not None and (
+            import_section_bounds is None or not _is_import_section_changed(
+                file_lines,
+                changed_lines,
+                import_section_bounds
+            )
+        ):
+            section_rules = []
+        fixed_file_lines = None
+        for rule in section_rules:
+            rule_diagnostics, rule_file_lines = self._get_check(
+                rule,
+                rule.check_import_section
+            )(fixed_file_lines or file_lines, import_section_bounds)
+            diagnostics.extend(rule_diagnostics)
+            if rule_file_lines is not None:
+                fixed_file_lines = rule_file_lines
+                # Следующие правила получают границы раздела импортов 
+                # исправленных строк
+                import_section_bounds = \
+                    _get_import_section_bounds(fixed_file_lines)
+        fixed_source = source
+        if fixed_file_lines is not None:
+            fixed_source = _join_file_lines(fixed_file_lines, source)
+        if _active_profile:
+            for name, (duration, calls) in self.timings.items():
+                _active_profile.add_rule(name, duration, calls)
+            self.timings = {}
+        return Result(diagnostics, fixed_source, fixed_source != source)
+
+    def _get_check(self, rule: Rule, check: Callable) -> Callable:
+        '''
+        Возвращает метод правила, а если включено профилирование — обёртку, 
+        которая учитывает время и количество вызовов метода
+        '''
+        if _active_profile is None:
+            return check
+        import time
+
+        clock = time.perf_counter
+        timing = self.timings.setdefault(rule.name, [0.0, 0])
+
+        def timed_check(*args):
+            start = clock()
+            result = check(*args)
+            timing[0] += clock() - start
+            timing[1] += 1
+            return result
+
+        return timed_check
+
+
+# Правила, которые можно включить по имени
+RULES = {
+    LineLengthRule.name: LineLengthRule,
+    ImportOrderRule.name: ImportOrderRule
+}
+
+
+# Память реорганизованных разделов импортов. Ключ записи — нормализованный 
+# текст раздела импортов (строки импортов и комментарии без пустых строк) и 
+# хэш индекса модулей, значение — строки реорганизованного раздела. Поэтому 
+# одинаковые разделы импортов разных файлов разбираются, классифицируются и 
+# сортируются один раз. Количество записей ограничено, при превышении 
+# удаляются записи, которые дольше всего не использовались. Если задан кэш 
+# результатов, записи дополнительно сохраняются в нём и переживают запуск
+class ImportsMemo:
+
+    def __init__(self, max_entries: int = 4096) -> None:
+        self.max_entries = max_entries
+        self.entries = {}
+        self.results_cache = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get_key(self, import_lines: list) -> str:
+        '''
+        Возвращает ключ записи для списка словарей с импортами (как в 
+        get_import_lines_with_indices_and_comments)
+        '''
+        section_lines = [_get_module_index().get_fingerprint()]
+        for import_line in import_lines:
+            section_lines.extend(import_line['full_line_commentaries'])
+            section_lines.append(import_line['import_line'])
+        return '\n'.join(section_lines)
+
+    def get(self, key: str) -> list | None:
+        '''
+        Возвращает строки реорганизованного раздела импортов или ничего, 
+        если раздел ещё не реорганизовывался
+        '''
+        lines = self.entries.pop(key, None)
+        if lines is not None:
+            # Запись переносится в конец как последняя использованная
+            self.entries[key] = lines
+            self._count('hits')
+            return list(lines)
+        if self.results_cache:
+            lines = self.results_cache.get_records(self._get_cache_key(key))
+            if lines is not None:
+                self._store(key, lines)
+                self._count('disk_hits')
+                return list(lines)
+        self._count('misses')
+
+    def add(self, key: str, lines: list) -> None:
+        '''
+        Запоминает строки реорганизованного раздела импортов
+        '''
+        self._store(key, lines)
+        if self.results_cache:
+            self.results_cache.add(self._get_cache_key(key), lines)
+
+    def _store(self, key: str, lines: list) -> None:
+        self.entries[key] = tuple(lines)
+        if len(self.entries) > self.max_entries:
+            del self.entries[next(iter(self.entries))]
+
+    def _count(self, counter: str) -> None:
+        setattr(self, counter, getattr(self, counter) + 1)
+        if _active_profile:
+            _active_profile.imports_memo[counter] += 1
+
+    @staticmethod
+    def _get_cache_key(key: str) -> str:
+        import hashlib
+
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return f'imports:{_get_linter_fingerprint()}:{digest}'
+
+
+# Профиль, в который записываются этапы проверки в текущем процессе. Если 
+# профилирование не включено, этапы не учитываются
+_active_profile = None
+_no_phase = nullcontext()
+# Индекс модулей, по которому классифицируются модули в текущем процессе. 
+# Создаётся при первой классификации
+_module_index = None
+# Память реорганизованных разделов импортов текущего процесса
+_imports_memo = ImportsMemo()
+
+
+# Выставляются настройки логирования. Логи выводятся только при запуске 
+# из командной строки, обработчик добавляется в main
 logger = logging.getLogger('linter')
 logger.setLevel(logging.INFO)
-console_handler = logging.StreamHandler()
-formatter = ColourFormatter('%(message)s')
-console_handler.setFormatter(formatter)
-logger.addHandler(console_handler)
-
-
-# Добавляется CLI
-# Происходит разбор заданных аргументов
-parser = ArgumentParser(
-    prog='Linter',
-    description='Simple Python linter'
-)
-parser.add_argument('filepath')
-parser.add_argument(
-    '-i', 
-    '--imports',
-    default=False, 
-    action='store_true',
-    help='Реорганизация импортов'
-)
-parser.add_argument(
-    '-ll',
-    '--lines_lengths',
-    const=79,
-    nargs='?',
-    action='store',
-    help='Проверка длины строк. Можно указать максимально допустимое '
-    'значение (по умолчанию 79). Будут выданы строки с длиной, которая '
-    'превышает указанное значение'
-)
-args = parser.parse_args()
+logger.addHandler(logging.NullHandler())
 
 
 def open_file(filepath: str | Path) -> str:
@@ -91,15 +1161,29 @@ def check_lines_lenghts(
         'Проверка, есть ли строки, которые '
         f'содержат более {max_length} знаков'
     )
-    for idx, line in enumerate(file_lines):        
-        if len(line) > max_length:
-            logger.error(
-                f'Строка {idx + 1}: "{line.lstrip()[:50]}..." '
-            )
+    for diagnostic in _get_lines_lenghts_diagnostics(file_lines, max_length):
+        logger.error(diagnostic.message)
+
+
+def check_file_lines_lenghts(
+    filepath: str | Path,
+    max_length: int = 79
+) -> None:
+    '''
+    Проверяет длину строк файла, не загружая его в память целиком 
+    (используется, когда не требуется реорганизация импортов)
+    '''
+    logger.info(
+        'Проверка, есть ли строки, которые '
+        f'содержат более {max_length} знаков'
+    )
+    for line_number, line in _iter_long_lines(filepath, max_length):
+        logger.error(_get_line_length_diagnostic(line_number, line).message)
 
 
 def get_import_lines_with_indices_and_comments(
-        file_lines: list
+        file_lines: list,
+        import_section_bounds: tuple | None = None
     ) -> tuple | None:
     '''
     Возвращает список словарей, где каждый словарь содержит строку импорта, 
@@ -107,56 +1191,59 @@ def get_import_lines_with_indices_and_comments(
     все комментарии выше строки импорта до предыдущего импорта считаются 
     комментариями нижестоящего импорта. Также словарь содержит номер строки 
     импорта в изначальном файле. Возвращает начальный и конечный индексы 
-    раздела импортов в списке строк содержимого
+    раздела импортов в списке строк содержимого. Границы раздела импортов 
+    можно передать, если они уже известны
     '''
     import_lines = []
-    start_index = _get_import_section_start_index(file_lines)
-    if not isinstance(start_index, int):
+    if import_section_bounds is None:
+        import_section_bounds = _get_import_section_bounds(file_lines)
+    if not import_section_bounds:
         return
-    end_index = _get_import_section_end_index(file_lines)
+    start_index, end_index = import_section_bounds
     # Выделяем раздел импортов
     import_section = file_lines[start_index:end_index]
     
     # Создаём список словарей с импортами и номерами строк этих импортов, 
-    # а также комментариями к этим импортам
-    def get_full_line_commentaries(line_index: int) -> list:
-        commentaries = []
-        count = 0
-        while True:
-            count += 1
-            line_above_import = import_section[line_index - count].strip()
-            if line_above_import.startswith('#'):
-                commentaries.append(line_above_import)
-            elif line_above_import == '':
-                continue
-            else:
-                break
-        return commentaries[::-1]
-        
-    import_lines = [
-        {
-            'import_line': line,
-            'line_index': idx + 1,
-            'full_line_commentaries': get_full_line_commentaries(idx)
-        } for idx, line in enumerate(import_section) \
-            if line.strip() != '' and not line.strip().startswith('#')
-    ]
+    # а также комментариями к этим импортам. Комментарии накапливаются 
+    # при проходе по разделу и передаются ближайшему следующему импорту
+    pending_commentaries = []
+    for idx, line in enumerate(import_section):
+        stripped_line = line.strip()
+        if stripped_line.startswith('#'):
+            pending_commentaries.append(stripped_line)
+        elif stripped_line != '':
+            import_lines.append({
+                'import_line': line,
+                'line_index': start_index + idx + 1,
+                'full_line_commentaries': pending_commentaries
+            })
+            pending_commentaries = []
     return import_lines, start_index, end_index
 
 
 def update_import_lines(import_lines: list) -> list:
     '''
     Проверяет наличие повторяющихся импортов и 
-    обновляет раздел импортов, если повторений нет
+    обновляет раздел импортов, если повторений нет. Результат 
+    запоминается, и одинаковые разделы импортов повторно не обрабатываются
     '''
+    # Одинаковые разделы импортов реорганизуются один раз
+    memo_key = _imports_memo.get_key(import_lines)
+    updated_import_lines = _imports_memo.get(memo_key)
+    if updated_import_lines is not None:
+        return updated_import_lines
     # Переводим строки раздела импортов в удобный формат
-    imports_dicts = _get_imports_dicts_detailed(import_lines)
+    with _phase('parse'):
+        import_records = _get_import_records(import_lines)
     # Проверяем наличие дубликатов
-    _check_duplicates(imports_dicts)
+    with _phase('duplicates'):
+        _check_duplicates(import_records)
     # Меняем порядок импортов для его соответствия PEP8
-    updated_import_lines = _reorganize_order(
-        imports_dicts
-    )
+    with _phase('reorder'):
+        updated_import_lines = _reorganize_order(
+            import_records
+        )
+    _imports_memo.add(memo_key, updated_import_lines)
     return updated_import_lines
 
 
@@ -167,428 +1254,1725 @@ def update_file_lines(
     file_lines_end_index: int
 ) -> list:
     '''
-    Обновляет исходные данные файла
+    Обновляет исходные данные файла. Изменения сначала описываются списком 
+    замен, затем применяются за один проход при сборке новых строк файла
     '''
-    file_lines[file_lines_start_index:file_lines_end_index] = new_lines
-    updated_code_start_index = file_lines_start_index
-    updated_code_end_index = file_lines_start_index + len(new_lines)
-    file_lines = _add_spacing(
+    edit_script = _get_edit_script(
         file_lines,
-        updated_code_start_index,
-        updated_code_end_index
+        new_lines,
+        file_lines_start_index,
+        file_lines_end_index
     )
-    return file_lines
+    return _apply_edit_script(file_lines, edit_script)
 
 
 def update_file(filepath: str, new_file_lines: list) -> None:
     '''
-    Обновляет заданный файл
+    Обновляет заданный файл, если его содержимое отличается от нового
     '''
-    new_file_lines_str = '\n'.join(new_file_lines)
-    with open(filepath, 'w', encoding='utf-8') as file:
-        file.write(new_file_lines_str)
+    contents = '\n'.join(new_file_lines)
+    try:
+        with open(filepath, 'r', encoding='utf-8') as file:
+            if file.read() == contents:
+                return
+    except (OSError, UnicodeDecodeError):
+        pass
+    write_file(filepath, contents)
 
 
-def _add_spacing(
-        file_lines: list,
-        updated_code_start_index: int,
-        updated_code_end_index: int
-    ) -> list:
+def write_file(
+    filepath: str,
+    contents: str,
+    tail_offset: int | None = None
+) -> None:
     '''
-    Возвращает строки раздела импортов с правильным отступом после него
+    Записывает содержимое в заданный файл. Существующий файл заменяется 
+    атомарно: содержимое записывается во временный файл в той же 
+    директории, который затем переименовывается в заданный, поэтому при 
+    сбое файл не остаётся записанным наполовину. Если передан tail_offset, 
+    то после содержимого без изменений копируются байты существующего файла, 
+    начиная с этой позиции
     '''
-    # Ставим необходимые пустые строки после раздела импортов
-    empty_lines_after_imports = 0
-    for idx, line in enumerate(file_lines[updated_code_end_index:]):
-        if line.strip() == '':
-            empty_lines_after_imports += 1
-        else:
-            if line.startswith('#') or \
-                line.startswith('"""') or \
-                line.startswith("'''"):
-                if not empty_lines_after_imports:
-                    file_lines.insert(
-                        updated_code_end_index,
-                        ''
-                    )
-                elif empty_lines_after_imports > 1:
-                    for _ in range(empty_lines_after_imports - 1):
-                        file_lines.pop(updated_code_end_index)
-                break
-            else:
-                if empty_lines_after_imports < 2:
-                    for _ in range(2 - empty_lines_after_imports):
-                        file_lines.insert(
-                            updated_code_end_index,
-                            ''
-                        )
-                elif empty_lines_after_imports > 2:
-                    for _ in range(empty_lines_after_imports - 2):
-                        file_lines.pop(updated_code_end_index)
-                break
-    # Ставим необходимый отступ (если необходимо) перед разделом импортов
-    empty_lines_before_first_import = 0
-    for line in reversed(file_lines[:updated_code_start_index]):
-        if line.strip() != '':
-            break
+    import shutil
+    import tempfile
+
+    filepath = os.path.realpath(filepath)
+    try:
+        file_mode = os.stat(filepath).st_mode
+    except FileNotFoundError:
+        with open(filepath, 'w', encoding='utf-8') as file:
+            file.write(contents)
+        return
+    file_descriptor, temp_filepath = tempfile.mkstemp(
+        dir=os.path.dirname(filepath),
+        prefix=f'.{os.path.basename(filepath)}.',
+        suffix='.tmp'
+    )
+    try:
+        if tail_offset is None:
+            with os.fdopen(file_descriptor, 'w', encoding='utf-8') as file:
+                file.write(contents)
         else:
-            empty_lines_before_first_import += 1
-    if empty_lines_before_first_import > 1:
-        # Оставляем одну пустую строку, если их несколько
-        for _ in range(empty_lines_before_first_import-1):
-            file_lines.pop(
-                updated_code_start_index-empty_lines_before_first_import
-            )
-    return file_lines
+            with os.fdopen(file_descriptor, 'wb') as file, \
+                open(filepath, 'rb') as source_file:
+                file.write(contents.encode('utf-8'))
+                source_file.seek(tail_offset)
+                shutil.copyfileobj(source_file, file)
+        os.chmod(temp_filepath, file_mode & 0o7777)
+        os.replace(temp_filepath, filepath)
+    except BaseException:
+        os.unlink(temp_filepath)
+        raise
 
 
-def _get_import_section_start_index(file_lines: list) -> int | None:
+def lint_source(
+    source: str,
+    imports: bool = False,
+    max_line_length: int | None = None,
+    changed_lines: list | None = None,
+    rules: list | None = None
+) -> Result:
     '''
-    Возвращает индекс начала раздела импортов или ничего, если импортов нет
+    Проверяет исходный код и возвращает результат проверки: диагностики и 
+    код с реорганизованным разделом импортов (если требуется реорганизация 
+    импортов). Не выводит логи и не завершает процесс, поэтому может 
+    вызываться из других программ. Если передан список диапазонов 
+    изменённых строк, то длина проверяется только у изменённых строк, а 
+    импорты реорганизуются, только если изменения затронули начало файла 
+    до первой строки кода. Дополнительные правила (экземпляры Rule) 
+    выполняются после встроенных
     '''
-    # Определяем, где начинается раздел импортов 
-    # Если перед первым импортом несколько пустых строк, то считаем началом  
-    # вторую пустую строку (для последующего удаления лишних)
-    for idx, line in enumerate(file_lines):
-        if line.startswith('import') or line.startswith('from'):
-            start_index = idx
-            break
-    if not 'start_index' in locals():
-        return
-    return start_index
+    engine_rules = []
+    if max_line_length:
+        engine_rules.append(LineLengthRule(max_line_length))
+    if imports:
+        engine_rules.append(ImportOrderRule())
+    engine_rules.extend(rules or [])
+    return RuleEngine(engine_rules).run(source, changed_lines)
 
 
-def _get_import_section_end_index(file_lines: list) -> int:
+def fix_imports(source: str) -> str:
     '''
-    Возвращает индекс конца раздела импортов (добавляется один к
-    значению для корректного слайсинга)
+    Возвращает исходный код с реорганизованным разделом импортов или 
+    исходный код без изменений, если раздела импортов нет. Вызывает 
+    LinterError, если раздел импортов содержит ошибки
     '''
-    for idx, line in enumerate(file_lines):
-        if not line.startswith('import') and \
-            not line.startswith('from') and \
-            not line.startswith('#') and \
-            not line.strip() == '':
-            other_section_start_index = idx
-            break
-        if line.startswith('#'):
-            comment_index = idx
-            lines_after_comment = file_lines[comment_index:]
-            break_main_loop = False
-            for line in lines_after_comment:
-                if line.startswith('import') or \
-                    line.startswith('from'):
-                    break
-                elif line.startswith('#') or \
-                    line.strip() == '':
-                    continue
-                else:
-                    other_section_start_index = comment_index
-                    break_main_loop = True
-                    break
-            if break_main_loop:
-                break
-    for idx, line in enumerate(reversed(
-        file_lines[:other_section_start_index]
-    )):
-        if line.startswith('import') or \
-            line.startswith('from'):
-            end_index = other_section_start_index - idx
-            break
-    return end_index
+    fixed_file_lines = _fix_import_section(get_file_lines(source))
+    if fixed_file_lines is None:
+        return source
+    return _join_file_lines(fixed_file_lines, source)
 
 
-def _get_imports_dicts_detailed(
-    import_lines_with_indices_and_comments: list
-) -> list:
+def get_python_files(paths: list) -> list:
     '''
-    Переводит список словарей с импортами, номерами строк этих импортов и 
-    комментариями в формат списка словарей, где каждый словарь содержит 
-    изначальную строку импорта, ее номер в файле, сгенерированную строку 
-    импорта (когда исходная строка импорта содержит одновременную загрузку 
-    нескольких верхнеуровневых модулей, она разбивается на несколько строк, а 
-    каждый сгенерированный словарь соответствует одной строке импорта), 
-    название выгружаемого верхнеуровневого модуля, список словарей 
-    импортируемых элементов (элемент и псевдоним, если таковой есть)
-    '''
-    imports_dicts_detailed = []
-    regex_pattern = _get_import_string_regex()
-    for idx, import_line_with_index_and_comment \
-        in enumerate(import_lines_with_indices_and_comments):
-        line = import_line_with_index_and_comment['import_line']
-        line_index = import_line_with_index_and_comment['line_index']
-        import_string_match = re.match(
-            regex_pattern,
-            line
-        )
-        if import_string_match:
-            module = import_string_match.group('module')
-            module_alias = import_string_match.group('module_alias')
-            another_module = import_string_match.group('another_module')
-            module_var2 = import_string_match.group('module_var2')
-            inline_comment = import_string_match.group('inline_comment')
-            if inline_comment:
-                spaces_before_inline_comment = 0
-                for char in inline_comment:
-                    if char == ' ':
-                        spaces_before_inline_comment += 1
-                    else:
-                        if spaces_before_inline_comment != 2:
-                            formatted_inline_comment = '  ' + \
-                                inline_comment[spaces_before_inline_comment:]                            
-                        else:
-                            formatted_inline_comment = inline_comment
-                        break
-                # Проверяем, если стоит только один хэштэг
-                number_of_hashtags = 0
-                for char in formatted_inline_comment[3:]:
-                    if char == '#':
-                        number_of_hashtags += 1
-                    else:
-                        formatted_inline_comment = \
-                            formatted_inline_comment[:3] + \
-                            formatted_inline_comment[
-                                (3 + number_of_hashtags):
-                            ]
-                        break
-                # Ставим нужное кол-во пробелов между знаком "#" и 
-                # текстом комментария
-                spaces_before_comment_text = 0                
-                for char in formatted_inline_comment[3:]:
-                    if char == ' ':
-                        spaces_before_comment_text += 1
-                    else:
-                        formatted_inline_comment = \
-                            formatted_inline_comment[:3] + ' ' + \
-                            formatted_inline_comment[
-                                (3 + spaces_before_comment_text):
-                            ]
-                        break
-            full_line_commentaries = \
-                import_line_with_index_and_comment['full_line_commentaries']
-            if another_module:
-                modules_str = line.split('import ')[1]
-                if inline_comment:
-                    modules_with_aliases = modules_str[
-                        :-(len(inline_comment))
-                    ].split(', ')
-                else:
-                    modules_with_aliases = modules_str.split(', ')
-                for idx, module_with_alias in enumerate(modules_with_aliases):
-                    if inline_comment:
-                        new_line = 'import ' + module_with_alias + \
-                            formatted_inline_comment
-                    else:
-                        new_line = 'import ' + module_with_alias
-                    try:
-                        import_full_name, import_alias = \
-                        module_with_alias.split(' as ')
-                    except ValueError:
-                        import_full_name = module_with_alias
-                        import_alias = None
-                    module_name = import_full_name.split('.')[0]
-                    import_name = import_full_name.split('.')[-1]
-                    imports_dicts_detailed.append({
-                        'initial_string': line,
-                        'initial_string_index': line_index,
-                        'import_string': new_line,
-                        'module_name': module_name,
-                        'full_line_commentaries': full_line_commentaries \
-                            if idx == 0 else None,
-                        'import': [
-                            {
-                                'import_name': import_name,
-                                'import_alias': import_alias
-                            }
-                        ]
-                    })
-                continue
-            elif module:
-                module_name = module.split('.')[0]
-                imported = [
-                    {
-                        'import_name': module.split('.')[-1],
-                        'import_alias': module_alias
-                    }
-                ]
-            elif module_var2:
-                module_name = module_var2.split('.')[0]
-                imports_str = line.split('import ')[1]
-                imports_with_aliases = imports_str.split(', ')
-                imported = []
-                for import_with_alias in imports_with_aliases:
-                    try:
-                        import_full_name, import_alias = \
-                        import_with_alias.split(' as ')
-                    except ValueError:
-                        import_full_name = import_with_alias
-                        import_alias = None
-                    import_name = import_full_name.split('.')[-1]
-                    imported.append(
-                        {
-                            'import_name': import_name,
-                            'import_alias': import_alias
-                        }
-                    )        
-            if inline_comment:
-                new_line = line.replace(
-                    inline_comment,
-                    formatted_inline_comment
-                )
-            else:
-                new_line = line
-            imports_dicts_detailed.append({
-                'initial_string': line,
-                'initial_string_index': line_index,
-                'import_string': new_line,
-                'module_name': module_name,
-                'full_line_commentaries': full_line_commentaries,
-                'import': imported
-            })
-        else:
-            logger.error(
-                f'Ошибка в строке: "{line}". '
-                'Исправьте ошибку и перезапустите скрипт'
-            )
-            sys.exit()
-    return imports_dicts_detailed
+    Возвращает отсортированный список файлов для проверки. Файлы берутся 
+    как есть, директории обходятся рекурсивно (скрытые директории и 
+    "__pycache__" пропускаются), из них выбираются только ".py" файлы
+    '''
+    filepaths = set()
+    for path in paths:
+        if not os.path.isdir(path):
+            filepaths.add(path)
+            continue
+        for root, dirnames, filenames in os.walk(path):
+            dirnames[:] = [
+                dirname for dirname in dirnames \
+                    if not dirname.startswith('.') and \
+                    dirname != '__pycache__'
+            ]
+            for filename in filenames:
+                if filename.endswith('.py'):
+                    filepaths.add(os.path.join(root, filename))
+    return sorted(filepaths)
 
 
-def _get_import_string_regex() -> str:
+def _get_sized_filepaths(filepaths: list) -> list:
     '''
-    Возвращает regex-шаблон строки раздела импортов
+    Возвращает список кортежей (путь к файлу, размер) от больших файлов к 
+    меньшим. Размер недоступного файла считается нулевым, а файлы одного 
+    размера упорядочиваются по хэшу пути, поэтому порядок не зависит от 
+    порядка файлов и одинаков на всех машинах с одинаковым деревом файлов
     '''
-    return r'(^import\s(?P<module>\w+(\.\w+)*)' \
-        r'(?:\sas\s(?P<module_alias>\w+))?' \
-        r'(, (?P<another_module>\w+(\.\w+)*)' \
-        r'(?:\sas\s(?P<another_module_alias>\w+))?)*|' \
-        r'(?:^from\s(\.|\.{2})?(?P<module_var2>\w+(\.\w+)*)\s' \
-        r'import\s(?P<subentity>(\w+|\*))' \
-        r'(?:\sas\s(?P<subentity_alias>\w+))?' \
-        r'(\,\s(?P<another_subentity>\w+)' \
-        r'(?:\sas\s(?P<another_subentity_alias>\w+))?)*))' \
-        r'(?P<inline_comment>(\s+)?\#.+)?$'
+    import hashlib
+
+    sized_filepaths = []
+    for filepath in filepaths:
+        try:
+            size = os.path.getsize(filepath)
+        except OSError:
+            size = 0
+        path_hash = hashlib.sha256(
+            Path(filepath).as_posix().encode('utf-8')
+        ).hexdigest()
+        sized_filepaths.append((-size, path_hash, filepath))
+    sized_filepaths.sort()
+    return [(filepath, -size) for size, _, filepath in sized_filepaths]
 
 
-def _check_duplicates(imports_dicts: list) -> None:
+def get_shard(filepaths: list, shard_index: int, shard_count: int) -> list:
     '''
-    Проверяет наличие повторяющихся импортов
+    Возвращает отсортированный список файлов части shard_index (от 1 до 
+    shard_count) при разбиении файлов на shard_count частей примерно 
+    одинакового суммарного размера. Файлы распределяются в порядке 
+    _get_sized_filepaths, каждый — в наименее загруженную часть
     '''
-    imports_dicts_wo_dp_lns = []
-    for import_dict in imports_dicts:
-        if import_dict not in imports_dicts_wo_dp_lns:
-            imports_dicts_wo_dp_lns.append(import_dict)
-        else:
-            logger.error(
-                'Найден повторный импорт в строке '
-                f'{import_dict['initial_string_index']}: '
-                f'"{import_dict['initial_string']}", '
-                'исправьте проблему и перезапустите скрипт'
-            )
-            sys.exit()
-    imports_names = set()
-    imports_aliases = set()
-    for import_dict in imports_dicts_wo_dp_lns:
-        ln_imports_names_with_aliases = [
-            imp for imp in import_dict['import']
-        ]
-        for import_name_with_alias in ln_imports_names_with_aliases:
-            import_name = import_name_with_alias['import_name']
-            import_alias = import_name_with_alias['import_alias']
-            if import_name not in imports_names:
-                imports_names.add(import_name)
-            else:
-                logger.error(
-                    'Найден повторный импорт в строке '
-                    f'{import_dict['initial_string_index']}: '
-                    f'"{import_dict['initial_string']}", '
-                    'исправьте проблему и перезапустите скрипт'
-                )
-                sys.exit()
-            if import_alias and import_alias not in imports_aliases:
-                imports_aliases.add(import_alias)
-            elif import_alias:
-                logger.error(
-                    'Найден повторный псевдоним в строке '
-                    f'{import_dict['initial_string_index']}: '
-                    f'"{import_dict['initial_string']}", '
-                    'исправьте проблему и перезапустите скрипт'
-                )
-                sys.exit()
+    import heapq
 
+    loads = [(0, idx) for idx in range(shard_count)]
+    shard = []
+    for filepath, size in _get_sized_filepaths(filepaths):
+        load, idx = heapq.heappop(loads)
+        if idx == shard_index - 1:
+            shard.append(filepath)
+        # Пустые файлы тоже требуют времени на проверку
+        heapq.heappush(loads, (load + size + 1, idx))
+    return sorted(shard)
 
-def _reorganize_order(imports_dicts_detailed: list) -> list:
-    '''
-    Реорганизует раздел импортов согласно PEP8
 
-    Для того, чтобы корректно отразились сторонние модули, 
-    они должны быть установлены. Если используется виртуальная 
-    среда, она должна быть активирована
+def merge_reports(report_filepaths: list) -> list:
     '''
-    standard_and_builtin = []
-    third_party = []
-    local = []
-    for import_dict in imports_dicts_detailed:
-        imported_module_name = import_dict['module_name']
-        if imported_module_name in sys.stdlib_module_names or \
-            imported_module_name in sys.builtin_module_names:
-            standard_and_builtin.append(import_dict)
+    Объединяет отчёты в формате строк JSON (например, отчёты частей при 
+    разбиении проверки с "--shard") и возвращает список кортежей (путь к 
+    файлу, диагностики), отсортированный по путям к файлам. Строки JSON 
+    есть только у диагностик, поэтому файлов без диагностик в результате нет
+    '''
+    import json
+
+    levels = {
+        names[0]: level for level, names in Reporter.LEVELS.items()
+    }
+    results = {}
+    for report_filepath in report_filepaths:
+        with open(report_filepath, 'r', encoding='utf-8') as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                results.setdefault(record['path'], []).append(Diagnostic(
+                    record['rule'],
+                    levels.get(record['level'], logging.INFO),
+                    record['line'],
+                    record['message']
+                ))
+    return sorted(results.items())
+
+
+def get_changed_lines(
+    paths: list | None = None,
+    ref: str | None = None,
+    staged: bool = False
+) -> dict:
+    '''
+    Возвращает словарь, где ключ — путь к изменённому ".py" файлу, а 
+    значение — список диапазонов (начало, конец) номеров изменённых строк. 
+    Изменения берутся из локального git: по сравнению с ref (по умолчанию 
+    HEAD) или только подготовленные к коммиту изменения, если staged. 
+    Номера строк подготовленных изменений переводятся в номера строк 
+    рабочего дерева с учётом изменений, ещё не подготовленных к коммиту. Для 
+    новых файлов, которые ещё не отслеживаются git, значение — None (файл 
+    изменён целиком). Вызывает subprocess.CalledProcessError, если git 
+    завершился с ошибкой
+    '''
+    import subprocess
+
+    def run_git(*git_args: str) -> str:
+        return subprocess.run(
+            ['git', '-c', 'core.quotePath=false', *git_args],
+            capture_output=True,
+            check=True,
+            encoding='utf-8'
+        ).stdout
+
+    pathspec = ['--', *(paths or [])]
+    toplevel = run_git('rev-parse', '--show-toplevel').strip()
+    diff_args = ['diff', '-U0', '--no-color', '--no-ext-diff']
+    diff_args.append('--diff-filter=ACMR')
+    if staged:
+        diff_args.append('--cached')
+    if ref or not staged:
+        diff_args.append(ref or 'HEAD')
+    changed_lines = {}
+    for filepath, hunks in _get_diff_hunks(
+        run_git(*diff_args, *pathspec),
+        toplevel
+    ).items():
+        changed_lines[filepath] = [
+            _get_hunk_line_range(hunk) for hunk in hunks
+        ]
+    if staged and changed_lines:
+        # Подготовленные изменения пронумерованы по версии файла в индексе, 
+        # а проверяется файл рабочего дерева, поэтому номера строк 
+        # сдвигаются на изменения, ещё не подготовленные к коммиту
+        for filepath, hunks in _get_diff_hunks(
+            run_git(
+                'diff',
+                '-U0',
+                '--no-color',
+                '--no-ext-diff',
+                '--',
+                *changed_lines
+            ),
+            toplevel
+        ).items():
+            if filepath in changed_lines:
+                changed_lines[filepath] = [
+                    (
+                        _map_index_line(start, hunks)[0],
+                        _map_index_line(end, hunks)[1]
+                    ) for start, end in changed_lines[filepath]
+                ]
+    if not staged:
+        for line in run_git(
+            'ls-files',
+            '--others',
+            '--exclude-standard',
+            '--full-name',
+            '-z',
+            *pathspec
+        ).split('\0'):
+            # С "-z" пути выводятся без экранирования
+            if line.endswith('.py'):
+                filepath = os.path.relpath(os.path.join(toplevel, line))
+                changed_lines[filepath] = None
+    return changed_lines
+
+
+def lint_file(
+    filepath: str,
+    imports: bool = False,
+    max_line_length: int | None = None,
+    results_cache: ResultsCache | None = None,
+    changed_lines: list | None = None,
+    mode: str = 'write',
+    rules: list | None = None
+) -> list:
+    '''
+    Проверяет один файл, перезаписывает его, если раздел импортов был 
+    реорганизован, и возвращает список диагностик. Дополнительные правила 
+    передаются в lint_source. Если передан кэш, то для 
+    файла, содержимое которого уже проверялось, возвращаются сохранённые 
+    диагностики. В кэш попадают только результаты проверок, которые не 
+    изменили файл. Диапазоны изменённых строк передаются в lint_source. 
+    В режимах "check" и "diff" файл не перезаписывается, а в диагностики 
+    добавляется сообщение о том, что раздел импортов требует реорганизации 
+    (в режиме "diff" — с изменениями раздела импортов в формате unified diff)
+    '''
+    cache_key = None
+    if results_cache:
+        cache_key = _get_cache_key(
+            filepath,
+            imports,
+            max_line_length,
+            changed_lines,
+            mode,
+            rules=rules
+        )
+        cached_diagnostics = cache_key and results_cache.get(cache_key)
+        if cached_diagnostics is not None:
+            return cached_diagnostics
+    if _active_profile:
+        _active_profile.start_file(filepath)
+    diagnostics, write_args = _check_file(
+        filepath,
+        imports,
+        max_line_length,
+        changed_lines,
+        mode,
+        rules=rules
+    )
+    if write_args:
+        with _phase('write'):
+            try:
+                write_file(filepath, *write_args)
+            except OSError as error:
+                diagnostics.append(
+                    _get_write_error_diagnostic(filepath, error)
+                )
+        return diagnostics
+    if cache_key:
+        results_cache.add(cache_key, diagnostics)
+    return diagnostics
+
+
+def lint_files(
+    filepaths: list,
+    imports: bool = False,
+    max_line_length: int | None = None,
+    jobs: int | None = None,
+    cache_dir: str | Path | None = None,
+    cache_size: int = 100000,
+    changed_lines: dict | None = None,
+    profile: Profile | None = None,
+    mode: str = 'write',
+    module_index: ModuleIndex | None = None,
+    rules: list | None = None
+) -> list:
+    '''
+    Проверяет файлы в пуле процессов и возвращает список кортежей 
+    (путь к файлу, диагностики), упорядоченный по путям к файлам. Если 
+    задана директория кэша, то неизменившиеся файлы повторно не проверяются. 
+    Если передан словарь изменённых строк (как в get_changed_lines), то 
+    файлы проверяются только в пределах изменений. Если передан профиль, 
+    то в него записываются этапы проверки каждого файла. Режим mode и 
+    дополнительные правила передаются в lint_file. Индекс модулей (по 
+    умолчанию — индекс текущего процесса) создаётся один раз и передаётся 
+    дочерним процессам
+    '''
+    from concurrent.futures import ProcessPoolExecutor
+
+    jobs = jobs or os.cpu_count() or 1
+    results = {}
+    if cache_dir:
+        # База данных кэша создаётся до запуска дочерних процессов
+        ResultsCache(cache_dir).close()
+    if imports and module_index is None:
+        module_index = _get_module_index()
+    profile_files = {}
+    imports_memo = {}
+    if jobs == 1 or len(filepaths) < 2:
+        results, profile_files, imports_memo = _lint_chunk(
+            filepaths,
+            imports,
+            max_line_length,
+            cache_dir,
+            changed_lines,
+            profile is not None,
+            mode,
+            module_index,
+            rules
+        )
+    else:
+        chunks = _get_chunks(filepaths, jobs)
+        with ProcessPoolExecutor(
+            max_workers=min(jobs, len(chunks))
+        ) as executor:
+            futures = [
+                executor.submit(
+                    _lint_chunk,
+                    chunk,
+                    imports,
+                    max_line_length,
+                    cache_dir,
+                    changed_lines,
+                    profile is not None,
+                    mode,
+                    module_index,
+                    rules
+                ) for chunk in chunks
+            ]
+            for future in futures:
+                chunk_results, chunk_profile_files, chunk_imports_memo = \
+                    future.result()
+                results.update(chunk_results)
+                profile_files.update(chunk_profile_files)
+                for counter, value in chunk_imports_memo.items():
+                    imports_memo[counter] = \
+                        imports_memo.get(counter, 0) + value
+    if profile is not None:
+        profile.files.update(profile_files)
+        for counter, value in imports_memo.items():
+            profile.imports_memo[counter] += value
+        profile.module_index = module_index
+    if cache_dir:
+        results_cache = ResultsCache(cache_dir)
+        results_cache.evict(cache_size)
+        results_cache.close()
+    return [(filepath, results[filepath]) for filepath in sorted(results)]
+
+
+def lint_files_pipeline(
+    filepaths: list,
+    imports: bool = False,
+    max_line_length: int | None = None,
+    jobs: int | None = None,
+    cache_dir: str | Path | None = None,
+    cache_size: int = 100000,
+    changed_lines: dict | None = None,
+    mode: str = 'write',
+    module_index: ModuleIndex | None = None,
+    max_in_flight: int = 64,
+    rules: list | None = None
+) -> list:
+    '''
+    Проверяет файлы так же, как lint_files, но конвейером: чтение и 
+    перезапись файлов выполняются в пуле потоков, а проверка — в пуле 
+    процессов (в одном потоке, если jobs равно единице), поэтому ожидание 
+    диска не простаивает проверку. Одновременно обрабатывается не больше 
+    max_in_flight файлов, поэтому в памяти находится не больше 
+    max_in_flight прочитанных файлов независимо от их общего количества
+    '''
+    import asyncio
+
+    jobs = jobs or os.cpu_count() or 1
+    if imports and module_index is None:
+        module_index = _get_module_index()
+    results = asyncio.run(_run_pipeline(
+        filepaths,
+        imports,
+        max_line_length,
+        jobs,
+        cache_dir,
+        changed_lines,
+        mode,
+        module_index,
+        max_in_flight,
+        rules
+    ))
+    if cache_dir:
+        results_cache = ResultsCache(cache_dir)
+        results_cache.evict(cache_size)
+        results_cache.close()
+    return [(filepath, results[filepath]) for filepath in sorted(results)]
+
+
+def watch(
+    paths: list,
+    imports: bool = False,
+    max_line_length: int | None = None,
+    jobs: int | None = None,
+    cache_dir: str | Path | None = None,
+    cache_size: int = 100000,
+    interval: float = 0.5,
+    debounce: float = 0.2,
+    mode: str = 'write',
+    rules: list | None = None
+) -> Iterator:
+    '''
+    Следит за изменениями ".py" файлов заданных путей и проверяет только 
+    изменившиеся файлы. Изменения определяются сравнением снимков времени 
+    изменения и размера файлов, которые делаются с заданным интервалом. 
+    Проверка начинается после того, как файлы перестают меняться в течение 
+    debounce секунд, поэтому серия сохранений проверяется один раз. Для 
+    каждой серии изменений возвращает список кортежей (путь к файлу, 
+    диагностики), упорядоченный по путям к файлам. Режим mode и 
+    дополнительные правила передаются в lint_file
+    '''
+    import time
+
+    jobs = jobs or os.cpu_count() or 1
+    snapshot = _get_files_snapshot(paths)
+    while True:
+        time.sleep(interval)
+        new_snapshot = _get_files_snapshot(paths)
+        changed_filepaths = {
+            filepath for filepath, file_state in new_snapshot.items() \
+                if snapshot.get(filepath) != file_state
+        }
+        while changed_filepaths:
+            time.sleep(debounce)
+            settled_snapshot = _get_files_snapshot(paths)
+            if settled_snapshot == new_snapshot:
+                break
+            changed_filepaths.update(
+                filepath for filepath, file_state \
+                    in settled_snapshot.items() \
+                    if new_snapshot.get(filepath) != file_state
+            )
+            new_snapshot = settled_snapshot
+        snapshot = new_snapshot
+        if not changed_filepaths:
+            continue
+        # Небольшие серии изменений проверяются в текущем процессе, где уже 
+        # накоплены результаты классификации модулей
+        results = lint_files(
+            sorted(changed_filepaths),
+            imports,
+            max_line_length,
+            jobs if len(changed_filepaths) >= jobs * 4 else 1,
+            cache_dir,
+            cache_size,
+            mode=mode,
+            rules=rules
+        )
+        # Файлы, исправленные при проверке, не должны считаться изменёнными
+        snapshot.update(
+            _get_files_snapshot([filepath for filepath, _ in results])
+        )
+        yield results
+
+
+def main(argv: list | None = None) -> None:
+    '''
+    Запускает проверку файлов из командной строки
+    '''
+    parser = _get_parser()
+    args = parser.parse_args(argv)
+    _configure_logging()
+    if args.jobs < 1:
+        parser.error('Количество процессов должно быть больше нуля')
+    if args.max_in_flight < 1:
+        parser.error('Количество файлов в обработке должно быть больше нуля')
+    if args.cache_size < 1:
+        parser.error('Количество записей в кэше должно быть больше нуля')
+    if args.pipeline and args.profile:
+        parser.error('Профилирование недоступно в режиме "--pipeline"')
+    if args.watch and (args.changed_since is not None or args.staged):
+        parser.error(
+            'Режим "--watch" недоступен с "--changed-since" и "--staged"'
+        )
+    max_line_length = int(args.lines_lengths) if args.lines_lengths else None
+    rules = []
+    if args.select:
+        # Правила, выбранные по имени, дополняют "--imports" и 
+        # "--lines_lengths". Встроенные правила включаются через эти 
+        # параметры, чтобы файлы проверялись без чтения целиком
+        for rule_name in args.select.split(','):
+            if rule_name not in RULES:
+                parser.error(f'Неизвестное правило: {rule_name}')
+            rule = RULES[rule_name]()
+            if type(rule) is ImportOrderRule:
+                args.imports = True
+            elif type(rule) is LineLengthRule:
+                max_line_length = max_line_length or rule.max_length
+            else:
+                rules.append(rule)
+    if args.python_env or args.source_root:
+        global _module_index
+
+        try:
+            if args.python_env:
+                _module_index = ModuleIndex.from_environment(
+                    args.python_env,
+                    args.source_root
+                )
+            else:
+                _module_index = ModuleIndex(source_roots=args.source_root)
+        except ValueError as error:
+            parser.error(str(error))
+    if args.merge:
+        try:
+            results = merge_reports(args.merge)
+        except (OSError, ValueError, KeyError) as error:
+            logger.error(f'Не удалось объединить отчёты: {error}')
+            sys.exit(1)
+        reporter = Reporter(args.format, max_line_length=max_line_length)
+        reporter.add_results(results)
+        reporter.flush()
+        if args.mode == 'check' and any(
+            diagnostic.rule == 'import-order' \
+                for _, diagnostics in results for diagnostic in diagnostics
+        ):
+            sys.exit(1)
+        return
+    if args.files_from:
+        # Пути к файлам читаются по одному на строку
+        if args.files_from == '-':
+            args.paths.extend(line.strip() for line in sys.stdin)
+        else:
+            with open(args.files_from, 'r', encoding='utf-8') as file:
+                args.paths.extend(line.strip() for line in file)
+        args.paths = [path for path in args.paths if path]
+    if args.server:
+        LanguageServer(
+            sys.stdin.buffer,
+            sys.stdout.buffer,
+            args.imports,
+            max_line_length,
+            rules
+        ).serve()
+        return
+    git_mode = args.changed_since is not None or args.staged
+    if not args.paths and not git_mode:
+        parser.error('Не указаны файлы или директории для проверки')
+    if '-' in args.paths:
+        if len(args.paths) > 1 or git_mode or args.watch:
+            parser.error(
+                'Стандартный поток ввода ("-") проверяется только отдельно '
+                'от других файлов'
+            )
+        is_changed = _lint_stream(
+            sys.stdin.buffer,
+            sys.stdout.buffer,
+            args.imports,
+            max_line_length,
+            args.mode,
+            args.format,
+            rules
+        )
+        if is_changed and args.mode == 'check':
+            sys.exit(1)
+        return
+    cache_dir = None if args.no_cache else args.cache_dir
+    changed_lines = None
+    if git_mode:
+        import subprocess
+
+        try:
+            changed_lines = get_changed_lines(
+                args.paths,
+                args.changed_since,
+                args.staged
+            )
+        except (OSError, subprocess.CalledProcessError) as error:
+            stderr = getattr(error, 'stderr', None) or str(error)
+            logger.error(f'Не удалось получить изменения из git: {stderr}')
+            sys.exit(1)
+        filepaths = sorted(changed_lines)
+    else:
+        filepaths = get_python_files(args.paths)
+    if args.shard:
+        filepaths = get_shard(filepaths, *args.shard)
+    profile = Profile() if args.profile else None
+    if args.pipeline:
+        results = lint_files_pipeline(
+            filepaths,
+            args.imports,
+            max_line_length,
+            args.jobs,
+            cache_dir,
+            args.cache_size,
+            changed_lines,
+            args.mode,
+            max_in_flight=args.max_in_flight,
+            rules=rules
+        )
+    else:
+        results = lint_files(
+            filepaths,
+            args.imports,
+            max_line_length,
+            args.jobs,
+            cache_dir,
+            args.cache_size,
+            changed_lines,
+            profile,
+            args.mode,
+            rules=rules
+        )
+    reporter = Reporter(args.format, max_line_length=max_line_length)
+    reporter.add_results(results)
+    reporter.flush()
+    if profile:
+        _write_profile(profile, args.profile)
+    if args.mode == 'check' and any(
+        diagnostic.rule == 'import-order' \
+            for _, diagnostics in results for diagnostic in diagnostics
+    ):
+        sys.exit(1)
+    if not args.watch:
+        return
+    logger.info('Ожидание изменений файлов (для выхода нажмите Ctrl+C)')
+    try:
+        for results in watch(
+            args.paths,
+            args.imports,
+            max_line_length,
+            args.jobs,
+            cache_dir,
+            args.cache_size,
+            args.watch_interval,
+            mode=args.mode,
+            rules=rules
+        ):
+            reporter.add_results(results)
+            reporter.flush()
+    except KeyboardInterrupt:
+        pass
+
+
+def _lint_stream(
+    input_stream: io.BufferedIOBase,
+    output_stream: io.BufferedIOBase,
+    imports: bool,
+    max_line_length: int | None,
+    mode: str = 'write',
+    output_format: str = 'text',
+    rules: list | None = None
+) -> bool:
+    '''
+    Проверяет исходный код из потока ввода без обращения к файловой 
+    системе. В режиме "write" в поток вывода записывается исправленный код, 
+    а отчёт о проверке выводится в стандартный поток ошибок. В режимах 
+    "check" и "diff" код не выводится, а отчёт (с диагностикой раздела 
+    импортов, если он требует реорганизации) записывается в поток вывода. 
+    Возвращает признак того, что исправления изменили код
+    '''
+    source = input_stream.read().decode('utf-8')
+    result = lint_source(source, imports, max_line_length, rules=rules)
+    diagnostics = result.diagnostics
+    if mode == 'write':
+        output_stream.write(result.source.encode('utf-8'))
+        output_stream.flush()
+        reporter = Reporter(output_format, sys.stderr, max_line_length)
+    else:
+        if result.is_changed:
+            diagnostics = diagnostics + [_get_import_order_diagnostic(
+                '-',
+                source,
+                result.source,
+                mode == 'diff'
+            )]
+        reporter = Reporter(
+            output_format,
+            io.TextIOWrapper(output_stream, encoding='utf-8'),
+            max_line_length
+        )
+    reporter.add_results([('-', diagnostics)])
+    reporter.flush()
+    if mode != 'write':
+        reporter.stream.detach()
+    return result.is_changed
+
+
+def _check_file(
+    filepath: str,
+    imports: bool = False,
+    max_line_length: int | None = None,
+    changed_lines: list | None = None,
+    mode: str = 'write',
+    contents: bytes | None = None,
+    rules: list | None = None
+) -> tuple:
+    '''
+    Проверяет файл (или его уже прочитанное содержимое, если оно передано) 
+    без записи и возвращает список диагностик и аргументы write_file для 
+    перезаписи файла (или ничего, если перезаписывать файл не нужно). 
+    Если переданы дополнительные правила, то файл проверяется целиком
+    '''
+    diagnostics = []
+    if not str(filepath).endswith('.py'):
+        diagnostics.append(Diagnostic(
+            'file-extension',
+            logging.WARNING,
+            None,
+            f'Не ".py" расширение файла: {filepath}'
+        ))
+    try:
+        if rules:
+            # Дополнительные правила проверяют весь файл, поэтому он 
+            # читается целиком, а длина строк проверяется вместе с ними
+            with _phase('read'):
+                source, tail_offset = _read_source(filepath, contents), None
+        elif imports:
+            # Для реорганизации импортов читается только начало файла до 
+            # первой строки кода
+            with _phase('read'):
+                source, tail_offset = _read_import_header(filepath, contents)
+        if max_line_length and not rules:
+            # Длина строк проверяется без загрузки файла в память целиком
+            with _phase('line_length'):
+                diagnostics.extend(
+                    _get_line_length_diagnostic(line_number, line) \
+                        for line_number, line in _iter_long_lines(
+                            filepath,
+                            max_line_length,
+                            contents
+                        ) if _is_line_changed(line_number, changed_lines)
+                )
+        if rules or imports:
+            result = lint_source(
+                source,
+                imports,
+                max_line_length if rules else None,
+                changed_lines,
+                rules
+            )
+            diagnostics.extend(result.diagnostics)
+            if result.is_changed and mode == 'write':
+                return diagnostics, (result.source, tail_offset)
+            if result.is_changed:
+                diagnostics.append(_get_import_order_diagnostic(
+                    filepath,
+                    source,
+                    result.source,
+                    mode == 'diff'
+                ))
+    except FileNotFoundError:
+        diagnostics.append(Diagnostic(
+            'file-not-found',
+            logging.ERROR,
+            None,
+            f'Неправильный путь к файлу: {filepath}'
+        ))
+    except (OSError, UnicodeDecodeError) as error:
+        # Ошибка чтения одного файла не прерывает проверку остальных
+        diagnostics.append(Diagnostic(
+            'file-read-error',
+            logging.ERROR,
+            None,
+            f'Не удалось прочитать файл {filepath}: '
+            f'{getattr(error, "strerror", None) or error}'
+        ))
+    return diagnostics, None
+
+
+def _get_write_error_diagnostic(filepath: str, error: OSError) -> Diagnostic:
+    '''
+    Возвращает диагностику ошибки перезаписи файла
+    '''
+    return Diagnostic(
+        'file-write-error',
+        logging.ERROR,
+        None,
+        f'Не удалось записать файл {filepath}: {error.strerror or error}'
+    )
+
+
+def _read_import_header(
+    filepath: str,
+    contents: bytes | None = None
+) -> tuple:
+    '''
+    Читает начало файла до первой строки кода включительно (только в нём 
+    может находиться раздел импортов и пустые строки, которые исправляются 
+    при реорганизации) и возвращает его текст и позицию в байтах, с которой 
+    начинается остаток файла. Если в начале файла встречаются переводы 
+    строк, отличные от "\\n", то читается и возвращается весь файл, а вместо 
+    позиции возвращается None. Если содержимое файла уже прочитано, то 
+    начало берётся из него
+    '''
+    header_lines = []
+    tail_offset = 0
+    if contents is not None:
+        file = io.BytesIO(contents)
+    else:
+        file = open(filepath, 'rb')
+    with file:
+        for raw_line in file:
+            line = raw_line.decode('utf-8')
+            if '\r' in line or len(line.splitlines()) > 1:
+                break
+            header_lines.append(line)
+            tail_offset += len(raw_line)
+            if not line.startswith('import') and \
+                not line.startswith('from') and \
+                not line.startswith('#') and line.strip() != '':
+                return ''.join(header_lines), tail_offset
+        else:
+            return ''.join(header_lines), tail_offset
+    return _read_source(filepath, contents), None
+
+
+def _read_source(filepath: str, contents: bytes | None = None) -> str:
+    '''
+    Возвращает текст файла или его уже прочитанного содержимого. Переводы 
+    строк в обоих случаях преобразуются одинаково
+    '''
+    if contents is not None:
+        file = io.TextIOWrapper(io.BytesIO(contents), encoding='utf-8')
+    else:
+        file = open(filepath, 'r', encoding='utf-8')
+    with file:
+        return file.read()
+
+
+def _get_import_order_diagnostic(
+    filepath: str,
+    source: str,
+    fixed_source: str,
+    diff: bool = False
+) -> Diagnostic:
+    '''
+    Возвращает диагностику раздела импортов, который требует реорганизации. 
+    Если diff, то сообщение содержит изменения в формате unified diff: один 
+    фрагмент, который охватывает только изменённые строки в начале файла и 
+    до трёх строк контекста вокруг них. Изменённые строки определяются 
+    сравнением общего начала и общего конца строк файла без поиска 
+    совпадений внутри (как в difflib)
+    '''
+    file_lines = get_file_lines(source)
+    fixed_file_lines = get_file_lines(fixed_source)
+    start = 0
+    while start < min(len(file_lines), len(fixed_file_lines)) and \
+        file_lines[start] == fixed_file_lines[start]:
+        start += 1
+    end = len(file_lines)
+    fixed_end = len(fixed_file_lines)
+    while end > start and fixed_end > start and \
+        file_lines[end - 1] == fixed_file_lines[fixed_end - 1]:
+        end -= 1
+        fixed_end -= 1
+    if not diff:
+        return Diagnostic(
+            'import-order',
+            logging.WARNING,
+            start + 1,
+            'Раздел импортов не соответствует PEP8'
+        )
+    hunk_start = max(start - 3, 0)
+    hunk_end = min(end + 3, len(file_lines))
+    fixed_hunk_end = fixed_end + hunk_end - end
+    # Для пустого фрагмента указывается номер строки перед ним
+    diff_lines = [
+        f'--- a/{filepath}',
+        f'+++ b/{filepath}',
+        f'@@ -{hunk_start + bool(hunk_end - hunk_start)},'
+        f'{hunk_end - hunk_start} '
+        f'+{hunk_start + bool(fixed_hunk_end - hunk_start)},'
+        f'{fixed_hunk_end - hunk_start} @@'
+    ]
+    diff_lines.extend(' ' + line for line in file_lines[hunk_start:start])
+    diff_lines.extend('-' + line for line in file_lines[start:end])
+    diff_lines.extend('+' + line for line in fixed_file_lines[start:fixed_end])
+    diff_lines.extend(' ' + line for line in file_lines[end:hunk_end])
+    return Diagnostic(
+        'import-order',
+        logging.WARNING,
+        start + 1,
+        '\n'.join(diff_lines)
+    )
+
+
+def _get_diff_hunks(diff: str, toplevel: str) -> dict:
+    '''
+    Разбирает вывод "git diff -U0" и возвращает словарь, где ключ — путь к 
+    ".py" файлу относительно текущей директории, а значение — список 
+    фрагментов изменений вида (начало, количество строк) до и после 
+    изменения
+    '''
+    import re
+
+    hunks = {}
+    filepath = None
+    hunk_pattern = re.compile(
+        r'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@'
+    )
+    for line in diff.splitlines():
+        if line.startswith('+++ '):
+            filepath = None
+            path = _unquote_git_path(line[4:])
+            if path.startswith('b/') and path.endswith('.py'):
+                filepath = os.path.relpath(os.path.join(toplevel, path[2:]))
+                hunks[filepath] = []
+            continue
+        match = hunk_pattern.match(line)
+        if not match or filepath is None:
+            continue
+        old_start, old_count, new_start, new_count = (
+            1 if group is None else int(group) for group in match.groups()
+        )
+        hunks[filepath].append((old_start, old_count, new_start, new_count))
+    return hunks
+
+
+def _unquote_git_path(path: str) -> str:
+    '''
+    Возвращает путь из заголовка вывода "git diff" без завершающей 
+    табуляции, которую git добавляет к путям с пробелами, и без 
+    экранирования в стиле C, которым git заключает в кавычки пути с 
+    кавычками, обратной косой чертой и управляющими символами
+    '''
+    path = path.removesuffix('\t')
+    if len(path) < 2 or path[0] != '"' or path[-1] != '"':
+        return path
+    escapes = {
+        'a': 7, 'b': 8, 't': 9, 'n': 10, 'v': 11, 'f': 12, 'r': 13,
+        '"': 34, '\\': 92
+    }
+    path_bytes = bytearray()
+    idx = 1
+    while idx < len(path) - 1:
+        char = path[idx]
+        if char != '\\':
+            path_bytes.extend(char.encode('utf-8'))
+            idx += 1
+        elif path[idx + 1] in escapes:
+            path_bytes.append(escapes[path[idx + 1]])
+            idx += 2
         else:
-            spec = importlib.util.find_spec(imported_module_name)
-            if spec and spec.origin:
-                is_third_party = False
-                module_path = os.path.abspath(spec.origin)
-                for site_package_path in sys.path:
-                    if 'site-packages' in site_package_path and \
-                    module_path.startswith(site_package_path):
-                        is_third_party = True
-                        break
-                if is_third_party:
-                    third_party.append(import_dict)
+            # Байты вне ASCII записываются восьмеричными кодами
+            path_bytes.append(int(path[idx + 1:idx + 4], 8))
+            idx += 4
+    return path_bytes.decode('utf-8')
+
+
+def _get_hunk_line_range(hunk: tuple) -> tuple:
+    '''
+    Возвращает диапазон номеров строк фрагмента изменений после изменения. 
+    Если строки только удалены, то изменёнными считаются соседние с 
+    удалёнными строки
+    '''
+    _, _, new_start, new_count = hunk
+    if new_count:
+        return new_start, new_start + new_count - 1
+    return max(new_start, 1), new_start + 1
+
+
+def _map_index_line(line_number: int, hunks: list) -> tuple:
+    '''
+    Возвращает диапазон номеров строк рабочего дерева, которому 
+    соответствует строка версии файла в индексе, по фрагментам изменений 
+    между индексом и рабочим деревом. Если строка сама изменена, то 
+    возвращается диапазон изменивших её строк
+    '''
+    offset = 0
+    for hunk in hunks:
+        old_start, old_count, new_start, new_count = hunk
+        if old_count == 0:
+            # Строки вставлены после строки old_start
+            if line_number <= old_start:
+                break
+        elif line_number < old_start:
+            break
+        elif line_number < old_start + old_count:
+            return _get_hunk_line_range(hunk)
+        offset += new_count - old_count
+    return line_number + offset, line_number + offset
+
+
+def _write_profile(profile: Profile, filepath: str) -> None:
+    '''
+    Записывает профиль проверки в JSON файл или в стандартный поток ошибок, 
+    если вместо пути к файлу указан "-" (в стандартный поток вывода 
+    выводится отчёт о проверке)
+    '''
+    import json
+
+    contents = json.dumps(profile.to_dict(), ensure_ascii=False, indent=4)
+    if filepath == '-':
+        sys.stderr.write(contents + '\n')
+    else:
+        write_file(filepath, contents + '\n')
+
+
+def _phase(name: str) -> 'Profile | nullcontext':
+    '''
+    Возвращает контекстный менеджер для учёта этапа проверки в активном 
+    профиле или пустой контекстный менеджер, если профилирование не включено
+    '''
+    if _active_profile is None:
+        return _no_phase
+    return _active_profile.phase(name)
+
+
+def _get_files_snapshot(paths: list) -> dict:
+    '''
+    Возвращает словарь, где ключ — путь к ".py" файлу заданных путей, а 
+    значение — время изменения и размер файла. Директории обходятся так же, 
+    как в get_python_files, с помощью os.scandir
+    '''
+    snapshot = {}
+    directories = []
+    for path in paths:
+        if os.path.isdir(path):
+            directories.append(path)
+            continue
+        try:
+            file_stat = os.stat(path)
+        except OSError:
+            continue
+        snapshot[path] = (file_stat.st_mtime_ns, file_stat.st_size)
+    while directories:
+        try:
+            entries = os.scandir(directories.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        if not entry.name.startswith('.') and \
+                            entry.name != '__pycache__':
+                            directories.append(entry.path)
+                    elif entry.name.endswith('.py'):
+                        entry_stat = entry.stat()
+                        snapshot[entry.path] = (
+                            entry_stat.st_mtime_ns,
+                            entry_stat.st_size
+                        )
+                except OSError:
+                    continue
+    return snapshot
+
+
+def _fix_import_section(
+    file_lines: list,
+    import_section_bounds: tuple | None = None
+) -> list | None:
+    '''
+    Возвращает строки файла с реорганизованным разделом импортов или 
+    ничего, если раздела импортов нет. Если раздел импортов и пустые строки 
+    вокруг него уже соответствуют PEP8, то возвращается исходный список 
+    строк файла
+    '''
+    if import_section_bounds is None:
+        import_section_bounds = _get_import_section_bounds(file_lines)
+    if import_section_bounds is None:
+        return
+    # Обычно раздел импортов уже соответствует PEP8, тогда он проверяется 
+    # за один проход и не пересобирается
+    with _phase('verify'):
+        is_section_sorted = _is_import_section_sorted(
+            file_lines,
+            *import_section_bounds
+        )
+    if is_section_sorted:
+        start_index, end_index = import_section_bounds
+        with _phase('spacing'):
+            edit_script = _get_edit_script(
+                file_lines,
+                file_lines[start_index:end_index],
+                start_index,
+                end_index
+            )
+            if len(edit_script) == 1:
+                return file_lines
+            return _apply_edit_script(file_lines, edit_script)
+    with _phase('section'):
+        import_lines_with_indices_and_comments = \
+            get_import_lines_with_indices_and_comments(
+                file_lines,
+                import_section_bounds
+            )
+    if not import_lines_with_indices_and_comments:
+        return
+    import_lines_to_update, start_index, end_index = \
+        import_lines_with_indices_and_comments
+    updated_import_lines = update_import_lines(import_lines_to_update)
+    with _phase('spacing'):
+        return update_file_lines(
+            file_lines,
+            updated_import_lines,
+            start_index,
+            end_index
+        )
+
+
+def _is_import_section_sorted(
+    file_lines: list,
+    start_index: int,
+    end_index: int
+) -> bool:
+    '''
+    Проверяет за один проход, что раздел импортов уже соответствует PEP8, 
+    то есть его реорганизация вернула бы те же строки: группы модулей идут 
+    по порядку и разделены одной пустой строкой, импорты внутри группы 
+    отсортированы, строчные комментарии отформатированы, повторений нет. 
+    Проверка прекращается на первом нарушении, раздел при этом не 
+    пересобирается
+    '''
+    groups_order = {'standard': 0, 'third_party': 1, 'local': 2}
+    imports_names = set()
+    imports_aliases = set()
+    previous_group = None
+    previous_sort_key = None
+    is_empty_line_pending = False
+    are_commentaries_pending = False
+    for idx in range(start_index, end_index):
+        line = file_lines[idx]
+        if line == '':
+            # Пустая строка допустима только перед комментариями и импортом
+            if is_empty_line_pending or are_commentaries_pending:
+                return False
+            is_empty_line_pending = True
+            continue
+        stripped_line = line.strip()
+        if stripped_line != line or not stripped_line:
+            return False
+        if line.startswith('#'):
+            are_commentaries_pending = True
+            continue
+        scanned_line = _scan_import_line(line)
+        if not scanned_line:
+            return False
+        entries = scanned_line['entries']
+        inline_comment = scanned_line['inline_comment']
+        if inline_comment and \
+            _format_inline_comment(inline_comment) != inline_comment:
+            return False
+        if scanned_line['kind'] == 'import':
+            if len(entries) > 1:
+                return False
+            name, alias, _, _ = entries[0]
+            module_name = name.split('.')[0]
+            names = ((name.split('.')[-1], alias),)
+            sort_key = (module_name, False, names[0][0])
+        else:
+            module_name = scanned_line['module'].lstrip('.').split('.')[0]
+            names = tuple((name, alias) for name, alias, _, _ in entries)
+            if len(names) > 1 and (
+                any(
+                    names[pos][0] > names[pos + 1][0] \
+                        for pos in range(len(names) - 1)
+                ) or line[:scanned_line['comment_start']] != \
+                    'from ' + scanned_line['module'] + ' import ' + \
+                    ', '.join(
+                        name + ' as ' + alias if alias else name \
+                            for name, alias in names
+                    )
+            ):
+                return False
+            sort_key = (module_name, True, names[0][0])
+        for import_name, import_alias in names:
+            if import_name in imports_names or \
+                (import_alias and import_alias in imports_aliases):
+                return False
+            imports_names.add(import_name)
+            if import_alias:
+                imports_aliases.add(import_alias)
+        group = groups_order[_classify_module(module_name)]
+        if group == previous_group:
+            if is_empty_line_pending or sort_key < previous_sort_key:
+                return False
+        elif previous_group is not None and (
+            group < previous_group or not is_empty_line_pending
+        ):
+            return False
+        previous_group = group
+        previous_sort_key = sort_key
+        is_empty_line_pending = False
+        are_commentaries_pending = False
+    return True
+
+
+def _join_file_lines(file_lines: list, source: str) -> str:
+    '''
+    Собирает строки файла в текст, сохраняя перевод строки в конце файла, 
+    если он был в исходном коде
+    '''
+    contents = '\n'.join(file_lines)
+    if source.endswith(('\n', '\r')):
+        contents += '\n'
+    return contents
+
+
+def _get_lines_lenghts_diagnostics(
+    file_lines: list,
+    max_length: int,
+    changed_lines: list | None = None
+) -> list:
+    '''
+    Возвращает диагностики строк, длина которых превышает max_length. Если 
+    передан список диапазонов изменённых строк, то учитываются только 
+    изменённые строки
+    '''
+    return [
+        _get_line_length_diagnostic(idx + 1, line) \
+            for idx, line in enumerate(file_lines) \
+            if len(line) > max_length and \
+            _is_line_changed(idx + 1, changed_lines)
+    ]
+
+
+def _is_line_changed(line_number: int, changed_lines: list | None) -> bool:
+    '''
+    Проверяет, входит ли строка в один из диапазонов изменённых строк 
+    (номера строк начинаются с единицы, границы включаются). Если список 
+    диапазонов не передан, то изменёнными считаются все строки
+    '''
+    if changed_lines is None:
+        return True
+    return any(start <= line_number <= end for start, end in changed_lines)
+
+
+def _is_import_section_changed(
+    file_lines: list,
+    changed_lines: list,
+    bounds: tuple | None = None
+) -> bool:
+    '''
+    Проверяет, затронули ли изменения начало файла: раздел импортов и 
+    пустые строки до первой строки кода после него. Только эти строки 
+    меняются при реорганизации импортов
+    '''
+    if bounds is None:
+        bounds = _get_import_section_bounds(file_lines)
+    if bounds is None:
+        return False
+    next_line_index = bounds[1]
+    while next_line_index < len(file_lines) - 1 and \
+        file_lines[next_line_index].strip() == '':
+        next_line_index += 1
+    return any(start <= next_line_index + 1 for start, _ in changed_lines)
+
+
+def _get_line_length_diagnostic(line_number: int, line: str) -> Diagnostic:
+    '''
+    Возвращает диагностику слишком длинной строки
+    '''
+    return Diagnostic(
+        'line-length',
+        logging.ERROR,
+        line_number,
+        f'Строка {line_number}: "{line.lstrip()[:50]}..." '
+    )
+
+
+def _get_edit_script(
+        file_lines: list,
+        new_lines: list,
+        start_index: int,
+        end_index: int
+    ) -> list:
+    '''
+    Возвращает список замен вида (начало, конец, новые строки), где начало 
+    и конец — индексы в исходном списке строк файла. Замены упорядочены и 
+    не пересекаются: удаление лишних пустых строк перед разделом импортов, 
+    замена раздела импортов и исправление количества пустых строк после 
+    него. Просматриваются только раздел импортов и пустые строки вокруг него
+    '''
+    edit_script = []
+    # Ставим необходимый отступ (если необходимо) перед разделом импортов
+    empty_lines_before_first_import = 0
+    while empty_lines_before_first_import < start_index and \
+        file_lines[
+            start_index - empty_lines_before_first_import - 1
+        ].strip() == '':
+        empty_lines_before_first_import += 1
+    if empty_lines_before_first_import > 1:
+        # Оставляем одну пустую строку, если их несколько
+        edit_script.append((
+            start_index - empty_lines_before_first_import,
+            start_index - 1,
+            []
+        ))
+    edit_script.append((start_index, end_index, new_lines))
+    # Ставим необходимые пустые строки после раздела импортов
+    next_line_index = end_index
+    while next_line_index < len(file_lines) and \
+        file_lines[next_line_index].strip() == '':
+        next_line_index += 1
+    if next_line_index == len(file_lines):
+        return edit_script
+    next_line = file_lines[next_line_index]
+    if next_line.startswith('#') or \
+        next_line.startswith('"""') or \
+        next_line.startswith("'''"):
+        required_empty_lines = 1
+    else:
+        required_empty_lines = 2
+    empty_lines_after_imports = next_line_index - end_index
+    if empty_lines_after_imports < required_empty_lines:
+        edit_script.append((
+            end_index,
+            end_index,
+            [''] * (required_empty_lines - empty_lines_after_imports)
+        ))
+    elif empty_lines_after_imports > required_empty_lines:
+        edit_script.append((
+            end_index,
+            end_index + empty_lines_after_imports - required_empty_lines,
+            []
+        ))
+    return edit_script
+
+
+def _apply_edit_script(file_lines: list, edit_script: list) -> list:
+    '''
+    Возвращает новый список строк файла, собранный из неизменённых участков 
+    исходного списка и замен из списка замен
+    '''
+    updated_file_lines = []
+    position = 0
+    for start_index, end_index, new_lines in edit_script:
+        updated_file_lines.extend(file_lines[position:start_index])
+        updated_file_lines.extend(new_lines)
+        position = end_index
+    updated_file_lines.extend(file_lines[position:])
+    return updated_file_lines
+
+
+def _get_import_section_bounds(file_lines: list) -> tuple | None:
+    '''
+    Возвращает индексы начала и конца раздела импортов (к индексу последней 
+    строки импорта добавляется один для корректного слайсинга) или ничего, 
+    если импортов нет или раздел импортов не является первым в файле. 
+    Раздел импортов определяется за один проход, который завершается на 
+    первой строке, не являющейся импортом, комментарием или пустой строкой
+    '''
+    start_index = None
+    last_import_index = None
+    for idx, line in enumerate(file_lines):
+        if line.startswith('import') or line.startswith('from'):
+            if start_index is None:
+                start_index = idx
+            last_import_index = idx
+        elif not line.startswith('#') and line.strip() != '':
+            break
+    if start_index is None:
+        return
+    return start_index, last_import_index + 1
+
+
+def _get_import_records(
+    import_lines_with_indices_and_comments: list
+) -> list:
+    '''
+    Переводит список словарей с импортами, номерами строк этих импортов и 
+    комментариями в список записей ImportRecord. Когда исходная строка 
+    импорта содержит одновременную загрузку нескольких верхнеуровневых 
+    модулей, она разбивается на несколько строк, и каждая запись 
+    соответствует одной строке импорта. Импортируемые элементы 
+    "from"-импорта сортируются, а строка импорта пересобирается из 
+    отсортированных элементов и отформатированного строчного комментария
+    '''
+    import_records = []
+    for import_line_with_index_and_comment \
+        in import_lines_with_indices_and_comments:
+        line = import_line_with_index_and_comment['import_line']
+        line_index = import_line_with_index_and_comment['line_index']
+        full_line_commentaries = \
+            import_line_with_index_and_comment['full_line_commentaries']
+        scanned_line = _scan_import_line(line)
+        if not scanned_line:
+            raise LinterError([Diagnostic(
+                'import-syntax',
+                logging.ERROR,
+                line_index,
+                f'Ошибка в строке: "{line}". '
+                'Исправьте ошибку и перезапустите скрипт'
+            )])
+        entries = scanned_line['entries']
+        inline_comment = scanned_line['inline_comment']
+        if inline_comment:
+            formatted_inline_comment = _format_inline_comment(inline_comment)
+        else:
+            formatted_inline_comment = ''
+        if scanned_line['kind'] == 'import':
+            # Строка может загружать несколько модулей, тогда она 
+            # разбивается на несколько строк, по одной на модуль
+            for idx, (name, alias, start, end) in enumerate(entries):
+                module_name = name.split('.')[0]
+                import_name = name.split('.')[-1]
+                if len(entries) > 1:
+                    import_string = 'import ' + line[start:end] + \
+                        formatted_inline_comment
                 else:
-                    local.append(import_dict)
+                    import_string = line[:scanned_line['comment_start']] + \
+                        formatted_inline_comment
+                import_records.append(ImportRecord(
+                    line,
+                    line_index,
+                    import_string,
+                    module_name,
+                    full_line_commentaries if idx == 0 else None,
+                    ((import_name, alias),),
+                    None,
+                    formatted_inline_comment,
+                    False,
+                    (module_name, False, import_name)
+                ))
+            continue
+        module_name = scanned_line['module'].lstrip('.').split('.')[0]
+        names = tuple((name, alias) for name, alias, _, _ in entries)
+        import_string = line[:scanned_line['comment_start']] + \
+            formatted_inline_comment
+        if len(names) > 1:
+            # Сортировка выгружаемых элементов, если строка содержит 
+            # больше одного выгружаемого элемента
+            names = tuple(sorted(names, key=lambda x: x[0]))
+            import_string = 'from ' + scanned_line['module'] + \
+                ' import ' + ', '.join(
+                    name + ' as ' + alias if alias else name \
+                        for name, alias in names
+                ) + formatted_inline_comment
+        import_records.append(ImportRecord(
+            line,
+            line_index,
+            import_string,
+            module_name,
+            full_line_commentaries,
+            names,
+            scanned_line['module'],
+            formatted_inline_comment,
+            True,
+            (module_name, True, names[0][0])
+        ))
+    return import_records
+
+
+def _scan_import_line(line: str) -> dict | None:
+    '''
+    Разбирает строку импорта за один проход слева направо. Возвращает 
+    словарь с видом импорта ("import" или "from"), модулем "from"-импорта 
+    (вместе с точками относительного импорта), списком импортируемых 
+    элементов в виде кортежей (имя, псевдоним, начало, конец), где начало и 
+    конец — границы элемента вместе с псевдонимом в строке, позицией начала 
+    строчного комментария (вместе с пробелами перед ним) и самим 
+    комментарием. Возвращает None, если строка не является корректной 
+    строкой импорта
+
+    Разбор не использует возвраты: каждая позиция строки просматривается 
+    не более двух раз (при чтении лексемы и при проверке разделителя после 
+    неё), поэтому время разбора в худшем случае O(n), где n — длина строки
+    '''
+    length = len(line)
+
+    def is_space(pos: int) -> bool:
+        return pos < length and line[pos].isspace()
+
+    def scan_name(pos: int) -> int:
+        # Возвращает конец имени (\w+), начинающегося в позиции pos
+        while pos < length and (line[pos].isalnum() or line[pos] == '_'):
+            pos += 1
+        return pos
+
+    def scan_dotted_name(pos: int) -> int:
+        # Возвращает конец имени с точками (\w+(\.\w+)*)
+        end = scan_name(pos)
+        while end > pos and line.startswith('.', end):
+            name_end = scan_name(end + 1)
+            if name_end == end + 1:
+                break
+            end = name_end
+        return end
+
+    def scan_alias(pos: int) -> tuple:
+        # Возвращает псевдоним (\sas\s\w+) и его конец, если он есть
+        if is_space(pos) and line.startswith('as', pos + 1) and \
+            is_space(pos + 3):
+            alias_end = scan_name(pos + 4)
+            if alias_end > pos + 4:
+                return line[pos + 4:alias_end], alias_end
+        return None, pos
+
+    entries = []
+    if line.startswith('import') and is_space(6):
+        kind = 'import'
+        module = None
+        pos = 7
+        while True:
+            end = scan_dotted_name(pos)
+            if end == pos:
+                return
+            alias, alias_end = scan_alias(end)
+            entries.append((line[pos:end], alias, pos, alias_end))
+            pos = alias_end
+            if not line.startswith(', ', pos):
+                break
+            pos += 2
+    elif line.startswith('from') and is_space(4):
+        kind = 'from'
+        pos = 5
+        if line.startswith('..', pos):
+            pos += 2
+        elif line.startswith('.', pos):
+            pos += 1
+        end = scan_dotted_name(pos)
+        if end == pos:
+            return
+        module = line[5:end]
+        if not (is_space(end) and line.startswith('import', end + 1) and \
+            is_space(end + 7)):
+            return
+        pos = end + 8
+        while True:
+            if not entries and line.startswith('*', pos):
+                end = pos + 1
             else:
-                local.append(import_dict)
+                end = scan_name(pos)
+            if end == pos:
+                return
+            alias, alias_end = scan_alias(end)
+            entries.append((line[pos:end], alias, pos, alias_end))
+            pos = alias_end
+            if not (line.startswith(',', pos) and is_space(pos + 1)):
+                break
+            pos += 2
+    else:
+        return
+    # Всё, что осталось после импортируемых элементов, может быть только 
+    # строчным комментарием
+    comment_start = pos
+    while is_space(pos):
+        pos += 1
+    if comment_start == length:
+        inline_comment = None
+    elif line.startswith('#', pos) and pos + 1 < length:
+        inline_comment = line[comment_start:]
+    else:
+        return
+    return {
+        'kind': kind,
+        'module': module,
+        'entries': entries,
+        'comment_start': comment_start,
+        'inline_comment': inline_comment
+    }
+
+
+def _format_inline_comment(inline_comment: str) -> str:
+    '''
+    Приводит строчный комментарий к виду "  # Текст комментария": два 
+    пробела перед знаком "#", один знак "#" и один пробел после него
+    '''
+    comment = inline_comment.lstrip(' ')
+    if len(inline_comment) - len(comment) != 2:
+        inline_comment = '  ' + comment
+    comment_start, comment_text = inline_comment[:3], inline_comment[3:]
+    # Проверяем, если стоит только один хэштэг
+    if comment_text.lstrip('#'):
+        comment_text = comment_text.lstrip('#')
+    # Ставим нужное кол-во пробелов между знаком "#" и 
+    # текстом комментария
+    if comment_text.lstrip(' '):
+        comment_text = ' ' + comment_text.lstrip(' ')
+    return comment_start + comment_text
+
+
+def _check_duplicates(import_records: list) -> None:
+    '''
+    Проверяет наличие повторяющихся импортов и псевдонимов. Имена и 
+    псевдонимы собираются во множества, поэтому проверка выполняется за 
+    один проход, а обо всех найденных повторениях сообщается сразу (в 
+    LinterError)
+    '''
+    imports_names = set()
+    imports_aliases = set()
+    diagnostics = []
+    for import_record in import_records:
+        for import_name, import_alias in import_record.names:
+            if import_name in imports_names:
+                diagnostics.append(Diagnostic(
+                    'duplicate-import',
+                    logging.ERROR,
+                    import_record.initial_string_index,
+                    'Найден повторный импорт в строке '
+                    f'{import_record.initial_string_index}: '
+                    f'"{import_record.initial_string}", '
+                    'исправьте проблему и перезапустите скрипт'
+                ))
+            imports_names.add(import_name)
+            if import_alias in imports_aliases:
+                diagnostics.append(Diagnostic(
+                    'duplicate-alias',
+                    logging.ERROR,
+                    import_record.initial_string_index,
+                    'Найден повторный псевдоним в строке '
+                    f'{import_record.initial_string_index}: '
+                    f'"{import_record.initial_string}", '
+                    'исправьте проблему и перезапустите скрипт'
+                ))
+            elif import_alias:
+                imports_aliases.add(import_alias)
+    if diagnostics:
+        raise LinterError(diagnostics)
+
+
+def _reorganize_order(import_records: list) -> list:
+    '''
+    Реорганизует раздел импортов согласно PEP8
+
+    Для того, чтобы корректно отразились сторонние модули, 
+    они должны быть установлены. Если используется виртуальная 
+    среда, она должна быть активирована
+    '''
+    standard_and_builtin = []
+    third_party = []
+    local = []
+    modules_groups = {
+        'standard': standard_and_builtin,
+        'third_party': third_party,
+        'local': local
+    }
+    for import_record in import_records:
+        with _phase('classify'):
+            modules_group = _classify_module(import_record.module_name)
+        modules_groups[modules_group].append(import_record)
     imports_groups = []
     for imports_group in (standard_and_builtin, third_party, local):
         if imports_group:
-            # Сортируем в алфавитном порядке каждую группу импортов
-            imports_group_sorted_items = []
-            # Сортировка выгружаемых элементов, если строка содержит 
-            # больше одного выгружаемого элемента
-            imports_group_sorted_subitems = []
-            for imports_group_import in imports_group:
-                if len(imports_group_import['import']) > 1:
-                    imports_group_import['import'] = sorted(
-                        imports_group_import['import'],
-                        key=lambda x: x['import_name']
-                    )
-                    imports_group_import_sorted_items = [
-                        imp['import_name'] for imp in \
-                            imports_group_import['import']
-                    ] 
-                    imports_group_import['import_string'] = \
-                        'from ' + imports_group_import['module_name'] + ' ' \
-                            'import ' + ', '.join(
-                                imports_group_import_sorted_items
-                            )
-                imports_group_sorted_subitems.append(
-                    imports_group_import
-                )
-            imports_groups_sorted = sorted(
-                imports_group_sorted_subitems,
-                key=lambda x: (
-                    x['module_name'],
-                    'from' in x.get('initial_string'),
-                    x['import'][0]['import_name']
-                )
+            # Сортируем в алфавитном порядке каждую группу импортов по 
+            # заранее вычисленному ключу
+            imports_groups.append(
+                sorted(imports_group, key=lambda x: x.sort_key)
             )
-            imports_groups.append(imports_groups_sorted)
     reorganized_imports = []
     for idx, imports_group in enumerate(imports_groups):
         for imp in imports_group:
-            if imp['full_line_commentaries']:
-                reorganized_imports.extend(imp['full_line_commentaries'])
-            reorganized_imports.append(imp['import_string'])
+            if imp.full_line_commentaries:
+                reorganized_imports.extend(imp.full_line_commentaries)
+            reorganized_imports.append(imp.import_string)
         if idx != len(imports_groups) - 1:
             # Разделение различных групп раздела импортов
             # пустыми строками
@@ -596,28 +2980,623 @@ def _reorganize_order(imports_dicts_detailed: list) -> list:
     return reorganized_imports
 
 
-if __name__ == '__main__':
-    file_contents = open_file(args.filepath)
-    file_lines = get_file_lines(file_contents)
-    if args.lines_lengths:
-        max_line_length = int(args.lines_lengths)
-        check_lines_lenghts(file_lines, max_line_length)
-    if args.imports:
-        import_lines_with_indices_and_comments = \
-            get_import_lines_with_indices_and_comments(file_lines)
-        if import_lines_with_indices_and_comments:
-            import_lines_to_update, start_index, end_index = \
-            import_lines_with_indices_and_comments
-        else:
-            logger.warning('Раздела импортов не обнаружено')
-            sys.exit()
-        updated_import_lines = update_import_lines(
-            import_lines_to_update
+def _classify_module(module_name: str) -> str:
+    '''
+    Возвращает группу модуля: "standard" (стандартные и встроенные 
+    модули), "third_party" (сторонние модули) или "local" (локальные 
+    модули) по индексу модулей текущего процесса
+    '''
+    return _get_module_index().classify(module_name)
+
+
+def _get_module_index() -> ModuleIndex:
+    '''
+    Возвращает индекс модулей текущего процесса, создавая его при первом 
+    обращении
+    '''
+    global _module_index
+
+    if _module_index is None:
+        _module_index = ModuleIndex()
+    return _module_index
+
+
+def _iter_long_lines(
+    filepath: str | Path,
+    max_length: int,
+    contents: bytes | None = None
+) -> Iterator:
+    '''
+    Возвращает номера и содержимое строк файла, длина которых превышает 
+    max_length. Файл отображается в память и просматривается как 
+    последовательность байтов (см. _iter_buffer_long_lines), поэтому расход 
+    памяти не зависит от размера файла. Если содержимое файла уже 
+    прочитано, то просматривается оно
+    '''
+    import mmap
+
+    if contents is not None:
+        yield from _iter_buffer_long_lines(contents, max_length)
+        return
+    with open(filepath, 'rb') as file:
+        try:
+            mapped_file = mmap.mmap(
+                file.fileno(),
+                0,
+                access=mmap.ACCESS_READ
+            )
+        except ValueError:
+            # Пустой файл невозможно отобразить в память
+            return
+        with mapped_file:
+            yield from _iter_buffer_long_lines(mapped_file, max_length)
+
+
+def _iter_buffer_long_lines(
+    buffer: 'bytes | mmap.mmap',
+    max_length: int
+) -> Iterator:
+    '''
+    Возвращает номера и содержимое строк последовательности байтов, длина 
+    которых превышает max_length. Последовательность просматривается 
+    порциями фиксированного размера. Символ в UTF-8 занимает от одного до 
+    четырёх байтов, поэтому декодируются только строки, длина которых в 
+    байтах превышает max_length, и только первые 4 * (max_length + 51) 
+    байтов таких строк (этого достаточно, чтобы определить превышение и 
+    вывести начало строки). Переводом строки считаются только "\\n" и "\\r\\n"
+    '''
+    import re
+
+    # Шаблон проверяется только в начале строк, поэтому поиск выполняется 
+    # за один проход
+    long_line_pattern = re.compile(
+        rb'^[^\n]{%d}' % (max_length + 1),
+        re.MULTILINE
+    )
+    max_decoded_length = 4 * (max_length + 51)
+    line_number = 1
+    position = 0
+    for match in long_line_pattern.finditer(buffer):
+        line_start = match.start()
+        # Номер строки определяется подсчётом переводов строк порциями, 
+        # чтобы не копировать большие участки файла
+        for chunk_start in range(position, line_start, 1 << 20):
+            line_number += buffer[
+                chunk_start:min(chunk_start + (1 << 20), line_start)
+            ].count(b'\n')
+        position = line_start
+        line_end = buffer.find(b'\n', line_start)
+        if line_end == -1:
+            line_end = len(buffer)
+        if buffer[line_end - 1] == ord('\r'):
+            line_end -= 1
+        line = buffer[
+            line_start:min(line_end, line_start + max_decoded_length)
+        ].decode('utf-8', errors='replace')
+        if len(line) > max_length:
+            yield line_number, line
+
+
+async def _run_pipeline(
+    filepaths: list,
+    imports: bool,
+    max_line_length: int | None,
+    jobs: int,
+    cache_dir: str | Path | None,
+    changed_lines: dict | None,
+    mode: str,
+    module_index: ModuleIndex | None,
+    max_in_flight: int,
+    rules: list | None = None
+) -> dict:
+    '''
+    Проверяет файлы конвейером (см. lint_files_pipeline) и возвращает 
+    словарь результатов. Кэш результатов используется только в потоке 
+    цикла событий, новые результаты записываются одной транзакцией
+    '''
+    import asyncio
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    loop = asyncio.get_running_loop()
+    in_flight = asyncio.Semaphore(max_in_flight)
+    results_cache = ResultsCache(cache_dir) if cache_dir else None
+    results = {}
+    if jobs == 1:
+        cpu_executor = ThreadPoolExecutor(max_workers=1)
+    else:
+        cpu_executor = ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=_init_pipeline_worker,
+            initargs=(module_index,)
         )
-        updated_file_lines = update_file_lines(
-            file_lines,
-            updated_import_lines,
-            start_index,
-            end_index
+        # Дочерние процессы запускаются до появления потоков ввода-вывода
+        cpu_executor.submit(int).result()
+    io_executor = ThreadPoolExecutor(max_workers=min(max_in_flight, 32))
+
+    async def lint(filepath: str) -> None:
+        file_changed_lines = None
+        if changed_lines is not None:
+            file_changed_lines = changed_lines.get(filepath)
+        try:
+            contents = await loop.run_in_executor(
+                io_executor,
+                Path(filepath).read_bytes
+            )
+        except OSError:
+            # Диагностики ошибки чтения файла формируются как обычно
+            results[filepath], _ = _check_file(
+                filepath,
+                imports,
+                max_line_length,
+                file_changed_lines,
+                mode,
+                rules=rules
+            )
+            return
+        cache_key = None
+        if results_cache:
+            # Хеширование содержимого не блокирует цикл событий
+            cache_key = await loop.run_in_executor(
+                io_executor,
+                _get_cache_key,
+                filepath,
+                imports,
+                max_line_length,
+                file_changed_lines,
+                mode,
+                contents,
+                rules
+            )
+            cached_diagnostics = results_cache.get(cache_key)
+            if cached_diagnostics is not None:
+                results[filepath] = cached_diagnostics
+                return
+        diagnostics, write_args = await loop.run_in_executor(
+            cpu_executor,
+            _check_file,
+            filepath,
+            imports,
+            max_line_length,
+            file_changed_lines,
+            mode,
+            contents,
+            rules
+        )
+        # Прочитанное содержимое больше не нужно
+        del contents
+        if write_args:
+            try:
+                await loop.run_in_executor(
+                    io_executor,
+                    write_file,
+                    filepath,
+                    *write_args
+                )
+            except OSError as error:
+                diagnostics.append(
+                    _get_write_error_diagnostic(filepath, error)
+                )
+        elif cache_key:
+            results_cache.add(cache_key, diagnostics)
+        results[filepath] = diagnostics
+
+    try:
+        tasks = []
+        for filepath in filepaths:
+            # Следующий файл начинает обрабатываться, только когда 
+            # освобождается место в окне
+            await in_flight.acquire()
+            task = asyncio.create_task(lint(filepath))
+            task.add_done_callback(lambda _: in_flight.release())
+            tasks.append(task)
+        await asyncio.gather(*tasks)
+    finally:
+        io_executor.shutdown()
+        cpu_executor.shutdown()
+        if results_cache:
+            results_cache.flush()
+            results_cache.close()
+    return results
+
+
+def _init_pipeline_worker(module_index: ModuleIndex | None) -> None:
+    '''
+    Передаёт индекс модулей дочернему процессу конвейера
+    '''
+    global _module_index
+
+    if module_index is not None:
+        _module_index = module_index
+
+
+def _get_chunks(filepaths: list, jobs: int) -> list:
+    '''
+    Разбивает файлы на порции примерно одинакового суммарного размера. 
+    Файлы распределяются от больших к меньшим, поэтому большие файлы 
+    оказываются в отдельных порциях и начинают проверяться первыми, а 
+    мелкие файлы объединяются, чтобы не тратить время на передачу задач
+    '''
+    sized_filepaths = _get_sized_filepaths(filepaths)
+    # На каждый процесс приходится несколько порций, чтобы процессы, 
+    # закончившие работу раньше, забирали оставшиеся порции
+    chunk_size = max(
+        sum(size for _, size in sized_filepaths) // (jobs * 4),
+        1
+    )
+    chunks = []
+    chunk = []
+    current_chunk_size = 0
+    for filepath, size in sized_filepaths:
+        chunk.append(filepath)
+        current_chunk_size += size
+        if current_chunk_size >= chunk_size:
+            chunks.append(chunk)
+            chunk = []
+            current_chunk_size = 0
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def _lint_chunk(
+    filepaths: list,
+    imports: bool,
+    max_line_length: int | None,
+    cache_dir: str | Path | None = None,
+    changed_lines: dict | None = None,
+    profile: bool = False,
+    mode: str = 'write',
+    module_index: ModuleIndex | None = None,
+    rules: list | None = None
+) -> tuple:
+    '''
+    Проверяет порцию файлов (выполняется в дочернем процессе). Новые 
+    результаты и реорганизованные разделы импортов записываются в кэш одной 
+    транзакцией после проверки порции. Возвращает словарь результатов, 
+    словарь этапов проверки каждого файла и счётчики памяти разделов 
+    импортов (пустые, если профилирование не включено)
+    '''
+    import tracemalloc
+
+    global _active_profile, _module_index
+
+    if module_index is not None:
+        _module_index = module_index
+    results_cache = ResultsCache(cache_dir) if cache_dir else None
+    _imports_memo.results_cache = results_cache
+    stop_tracing = False
+    if profile:
+        _active_profile = Profile()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            stop_tracing = True
+    try:
+        results = {
+            filepath: lint_file(
+                filepath,
+                imports,
+                max_line_length,
+                results_cache,
+                None if changed_lines is None else changed_lines.get(filepath),
+                mode,
+                rules
+            ) for filepath in filepaths
+        }
+    finally:
+        chunk_profile, _active_profile = _active_profile, None
+        _imports_memo.results_cache = None
+        if stop_tracing:
+            tracemalloc.stop()
+    if results_cache:
+        results_cache.flush()
+        results_cache.close()
+    profile_files = {}
+    imports_memo = {}
+    if chunk_profile:
+        profile_files = {
+            filepath: phases \
+                for filepath, phases in chunk_profile.files.items() \
+                if filepath is not None
+        }
+        imports_memo = chunk_profile.imports_memo
+    return results, profile_files, imports_memo
+
+
+def _get_cache_key(
+    filepath: str,
+    imports: bool,
+    max_line_length: int | None,
+    changed_lines: list | None = None,
+    mode: str = 'write',
+    contents: bytes | None = None,
+    rules: list | None = None
+) -> str | None:
+    '''
+    Возвращает ключ кэша для файла или ничего, если файл не удалось 
+    прочитать. Если содержимое файла уже прочитано, то хэшируется оно. 
+    Ключ включает путь к файлу, так как он входит в текст некоторых 
+    диагностик (например, в изменения раздела импортов в режиме "diff")
+    '''
+    import hashlib
+
+    if contents is not None:
+        digest = hashlib.sha256(contents).hexdigest()
+    else:
+        try:
+            with open(filepath, 'rb') as file:
+                digest = hashlib.file_digest(file, 'sha256').hexdigest()
+        except OSError:
+            return
+    cache_key = \
+        f'{_get_linter_fingerprint()}:{digest}:{imports}:{max_line_length}:' \
+        f'{Path(filepath).as_posix()}'
+    if imports:
+        cache_key += f':{_get_module_index().get_fingerprint()}'
+    if changed_lines is not None:
+        cache_key += f':{changed_lines}'
+    if mode != 'write':
+        cache_key += f':{mode}'
+    if rules:
+        cache_key += ':' + ','.join(
+            f'{type(rule).__module__}.{type(rule).__qualname__}' \
+                for rule in rules
+        )
+    return cache_key
+
+
+@cache
+def _get_linter_fingerprint() -> str:
+    '''
+    Возвращает отпечаток линтера: версию, хэш исходного кода (чтобы 
+    изменения линтера без смены версии не приводили к устаревшим 
+    результатам) и окружение, от которого зависит классификация модулей
+    '''
+    import hashlib
+
+    source_digest = hashlib.sha256(Path(__file__).read_bytes()).hexdigest()
+    return f'{__version__}:{source_digest[:16]}:{sys.prefix}'
+
+
+def _get_parser() -> 'ArgumentParser':
+    '''
+    Возвращает парсер аргументов командной строки
+    '''
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(
+        prog='Linter',
+        description='Simple Python linter',
+        fromfile_prefix_chars='@'
+    )
+    parser.add_argument(
+        'paths',
+        nargs='*',
+        help='Файлы или директории для проверки. Директории обходятся '
+        'рекурсивно, проверяются все ".py" файлы. "-" — проверка кода из '
+        'стандартного потока ввода, исправленный код выводится в '
+        'стандартный поток вывода. Аргументы можно прочитать из файла, по '
+        'одному на строку: "@paths.txt"'
+    )
+    parser.add_argument(
+        '--files-from',
+        metavar='FILE',
+        help='Файл со списком путей для проверки, по одному на строку '
+        '("-" — чтение списка из стандартного потока ввода)'
+    )
+    parser.add_argument(
+        '--shard',
+        metavar='I/N',
+        type=_parse_shard,
+        help='Проверка только части I из N: файлы распределяются по частям '
+        'детерминированно, с учётом их размера'
+    )
+    parser.add_argument(
+        '--merge',
+        metavar='REPORT',
+        nargs='+',
+        help='Объединение отчётов частей в формате строк JSON '
+        '("--format json") в один отчёт вместо проверки файлов. Отчёты '
+        'содержат только диагностики, поэтому файлов без диагностик в '
+        'итоговом отчёте нет'
+    )
+    parser.add_argument(
+        '-i', 
+        '--imports',
+        default=False, 
+        action='store_true',
+        help='Реорганизация импортов'
+    )
+    parser.add_argument(
+        '-ll',
+        '--lines_lengths',
+        const=79,
+        nargs='?',
+        action='store',
+        help='Проверка длины строк. Можно указать максимально допустимое '
+        'значение (по умолчанию 79). Будут выданы строки с длиной, которая '
+        'превышает указанное значение'
+    )
+    parser.add_argument(
+        '--select',
+        metavar='RULES',
+        help='Правила проверки через запятую: '
+        f'{", ".join(RULES)}. Дополняют "--imports" и "--lines_lengths"'
+    )
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        type=int,
+        default=os.cpu_count(),
+        help='Количество процессов для параллельной проверки файлов '
+        '(по умолчанию равно количеству ядер)'
+    )
+    parser.add_argument(
+        '--pipeline',
+        default=False,
+        action='store_true',
+        help='Проверка конвейером: чтение и запись файлов выполняются '
+        'асинхронно, одновременно с проверкой уже прочитанных файлов'
+    )
+    parser.add_argument(
+        '--max-in-flight',
+        type=int,
+        default=64,
+        help='Максимальное количество файлов, одновременно находящихся в '
+        'обработке в режиме "--pipeline" (по умолчанию 64)'
+    )
+    parser.add_argument(
+        '--cache-dir',
+        default='.linter_cache',
+        help='Директория кэша результатов проверки (по умолчанию '
+        '".linter_cache"). Файлы, содержимое которых не изменилось с прошлой '
+        'проверки с теми же параметрами, повторно не проверяются'
+    )
+    parser.add_argument(
+        '--cache-size',
+        type=int,
+        default=100000,
+        help='Максимальное количество записей в кэше (по умолчанию 100000)'
+    )
+    parser.add_argument(
+        '--no-cache',
+        default=False,
+        action='store_true',
+        help='Не использовать кэш результатов проверки'
+    )
+    parser.add_argument(
+        '--python-env',
+        metavar='PATH',
+        help='Путь к виртуальному окружению, установленные модули которого '
+        'считаются сторонними (по умолчанию — окружение, в котором запущен '
+        'линтер)'
+    )
+    parser.add_argument(
+        '--source-root',
+        metavar='PATH',
+        action='append',
+        help='Корневая директория исходного кода проекта, модули которой '
+        'считаются локальными, даже если модуль с тем же именем установлен '
+        '(можно указать несколько раз, по умолчанию — текущая директория и '
+        'её поддиректория "src")'
+    )
+    parser.add_argument(
+        '--changed-since',
+        metavar='REF',
+        help='Проверять только ".py" файлы, изменённые по сравнению с '
+        'указанной ревизией git, в том числе новые неотслеживаемые файлы. '
+        'Длина проверяется только у изменённых строк, импорты '
+        'реорганизуются, только если изменения затронули раздел импортов'
+    )
+    parser.add_argument(
+        '--staged',
+        default=False,
+        action='store_true',
+        help='Проверять только подготовленные к коммиту изменения ".py" '
+        'файлов (так же, как "--changed-since")'
+    )
+    write_mode_group = parser.add_mutually_exclusive_group()
+    write_mode_group.add_argument(
+        '--write',
+        dest='mode',
+        action='store_const',
+        const='write',
+        default='write',
+        help='Перезаписывать файлы, раздел импортов которых был '
+        'реорганизован (по умолчанию). Файлы, содержимое которых не '
+        'изменилось, не перезаписываются'
+    )
+    write_mode_group.add_argument(
+        '--check',
+        dest='mode',
+        action='store_const',
+        const='check',
+        help='Не перезаписывать файлы, а завершиться с кодом 1, если раздел '
+        'импортов хотя бы одного файла требует реорганизации'
+    )
+    write_mode_group.add_argument(
+        '--diff',
+        dest='mode',
+        action='store_const',
+        const='diff',
+        help='Не перезаписывать файлы, а вывести изменения раздела импортов '
+        'в формате unified diff'
+    )
+    parser.add_argument(
+        '--format',
+        choices=Reporter.FORMATS,
+        default='text',
+        help='Формат отчёта о проверке: текст (по умолчанию), строки JSON '
+        '(по одной на диагностику) или SARIF'
+    )
+    parser.add_argument(
+        '--profile',
+        metavar='FILE',
+        const='-',
+        nargs='?',
+        help='Записать в JSON файл (по умолчанию в стандартный поток '
+        'ошибок, чтобы не смешивать профиль с отчётом) время, количество '
+        'вызовов и пик выделенной памяти для каждого этапа проверки '
+        'каждого файла и суммарно по всем файлам. Файлы, результаты '
+        'проверки которых взяты из кэша, не профилируются'
+    )
+    parser.add_argument(
+        '--watch',
+        default=False,
+        action='store_true',
+        help='После проверки следить за изменениями файлов и повторно '
+        'проверять изменившиеся файлы'
+    )
+    parser.add_argument(
+        '--watch-interval',
+        type=float,
+        default=0.5,
+        help='Интервал опроса файлов в режиме "--watch" в секундах '
+        '(по умолчанию 0.5)'
+    )
+    parser.add_argument(
+        '--server',
+        default=False,
+        action='store_true',
+        help='Запуск языкового сервера (LSP) через стандартные потоки '
+        'ввода-вывода. Документы проверяются с заданными параметрами '
+        '"--imports" и "--lines_lengths"'
+    )
+    return parser
+
+
+def _parse_shard(value: str) -> tuple:
+    '''
+    Разбирает значение параметра "--shard" вида "I/N" и возвращает номер 
+    части и количество частей
+    '''
+    from argparse import ArgumentTypeError
+
+    try:
+        shard_index, shard_count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise ArgumentTypeError(
+            f'Часть должна быть указана в виде "I/N": {value}'
+        )
+    if not 1 <= shard_index <= shard_count:
+        raise ArgumentTypeError(
+            f'Номер части должен быть от 1 до количества частей: {value}'
         )
-        update_file(args.filepath, updated_file_lines)
\ No newline at end of file
+    return shard_index, shard_count
+
+
+def _configure_logging() -> None:
+    '''
+    Настраивает вывод логов в консоль. Логи выделяются цветом, только если 
+    выводятся в терминал
+    '''
+    console_handler = logging.StreamHandler()
+    if console_handler.stream.isatty():
+        formatter = ColourFormatter('%(message)s')
+    else:
+        formatter = logging.Formatter('%(message)s')
+    console_handler.setFormatter(formatter)
+    logger.handlers = [console_handler]
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -1,6 +1,16 @@
+import io
+import json
 import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 import unittest
+from unittest import mock
 
+import benchmark
 import linter
 
 
@@ -131,4 +141,992 @@ class TestLinter(unittest.TestCase):
             test_output_file = test_file['test_output_file']
             with open(test_output_file, 'r', encoding='utf-8') as output_test_file:
                 output_test_file_contents = output_test_file.read()
-            self.assertEqual(new_file_lines_str, output_test_file_contents)
\ No newline at end of file
+            self.assertEqual(new_file_lines_str, output_test_file_contents)
+
+    def test_get_python_files(self):
+        result = linter.get_python_files(['tests'])
+        self.assertEqual(result, sorted(result))
+        for test_file in self.test_files:
+            self.assertIn(test_file['test_input_file'], result)
+            self.assertIn(test_file['test_output_file'], result)
+
+    def test_lint_files(self):
+        with tempfile.TemporaryDirectory() as temp_directory:
+            shutil.copytree('tests', temp_directory, dirs_exist_ok=True)
+            filepaths = linter.get_python_files([temp_directory])
+            result = linter.lint_files(filepaths, imports=True, jobs=2)
+            self.assertEqual([filepath for filepath, _ in result], filepaths)
+            for test_file in self.test_files:
+                test_input_file = os.path.join(
+                    temp_directory,
+                    os.path.relpath(test_file['test_input_file'], 'tests')
+                )
+                with open(test_input_file, 'r', encoding='utf-8') as file:
+                    updated_contents = file.read()
+                with open(
+                    test_file['test_output_file'],
+                    'r',
+                    encoding='utf-8'
+                ) as file:
+                    output_contents = file.read()
+                self.assertEqual(updated_contents, output_contents)
+
+    def test_scan_import_line(self):
+        result = linter._scan_import_line('from ..a.b import c as d, e  #x')
+        self.assertEqual(result['kind'], 'from')
+        self.assertEqual(result['module'], '..a.b')
+        self.assertEqual(
+            [(name, alias) for name, alias, _, _ in result['entries']],
+            [('c', 'd'), ('e', None)]
+        )
+        self.assertEqual(result['inline_comment'], '  #x')
+        self.assertIsNone(linter._scan_import_line('import os,sys'))
+        self.assertIsNone(linter._scan_import_line('from . import os'))
+        modules = ', '.join(f'a{idx}.b.c' for idx in range(50000))
+        result = linter._scan_import_line('import ' + modules)
+        self.assertEqual(len(result['entries']), 50000)
+        self.assertIsNone(linter._scan_import_line('import ' + modules + ','))
+
+    def test_update_import_lines_from_import(self):
+        result = linter.update_import_lines([
+            {
+                'import_line': 'from os.path import join as j, exists #x',
+                'line_index': 1,
+                'full_line_commentaries': []
+            }
+        ])
+        self.assertEqual(
+            result,
+            ['from os.path import exists, join as j  # x']
+        )
+
+    def test_lint_files_cache(self):
+        with tempfile.TemporaryDirectory() as temp_directory:
+            filepath = os.path.join(temp_directory, 'module.py')
+            with open(filepath, 'w', encoding='utf-8') as file:
+                file.write('import os\n\n\nprint(os.sep, "' + 'x' * 80 + '")')
+            cache_dir = os.path.join(temp_directory, 'cache')
+            result = linter.lint_files(
+                [filepath],
+                imports=True,
+                max_line_length=79,
+                cache_dir=cache_dir
+            )
+            with mock.patch.object(
+                linter,
+                'lint_source',
+                wraps=linter.lint_source
+            ) as lint_source_mock:
+                cached_result = linter.lint_files(
+                    [filepath],
+                    imports=True,
+                    max_line_length=79,
+                    cache_dir=cache_dir
+                )
+                lint_source_mock.assert_not_called()
+                self.assertEqual(cached_result, result)
+                linter.lint_files(
+                    [filepath],
+                    imports=True,
+                    max_line_length=100,
+                    cache_dir=cache_dir
+                )
+                lint_source_mock.assert_called_once()
+            # Кэш без записей означал бы молчаливое отключение кэша
+            with mock.patch.object(sys, 'stderr', io.StringIO()) as stderr:
+                with self.assertRaises(SystemExit):
+                    linter.main(['--cache-size', '0', filepath])
+            self.assertIn('записей в кэше', stderr.getvalue())
+
+    def test_check_file_lines_lenghts(self):
+        with tempfile.TemporaryDirectory() as temp_directory:
+            filepath = os.path.join(temp_directory, 'module.py')
+            contents = '\r\n'.join([
+                'import os',
+                'x = "' + 'ы' * 60 + '"',
+                '',
+                'y = "' + 'z' * 75 + '"',
+                'w = "' + 'ы' * 75 + '"',
+                'print(os.sep)'
+            ])
+            with open(filepath, 'w', encoding='utf-8', newline='') as file:
+                file.write(contents)
+            for max_length in (10, 79):
+                with self.assertLogs('linter') as stream_logs:
+                    linter.check_file_lines_lenghts(filepath, max_length)
+                with self.assertLogs('linter') as memory_logs:
+                    linter.check_lines_lenghts(
+                        linter.get_file_lines(contents),
+                        max_length
+                    )
+                self.assertEqual(stream_logs.output, memory_logs.output)
+            self.assertEqual(len(stream_logs.output), 3)
+
+    def test_update_import_lines_duplicates(self):
+        import_lines = [
+            {
+                'import_line': import_line,
+                'line_index': idx + 1,
+                'full_line_commentaries': []
+            } for idx, import_line in enumerate((
+                'import os',
+                'import sys as s',
+                'from os import path',
+                'import os',
+                'import re as s',
+                'from os.path import join, path'
+            ))
+        ]
+        with self.assertRaises(linter.LinterError) as error:
+            linter.update_import_lines(import_lines)
+        self.assertEqual(
+            [
+                (diagnostic.rule, diagnostic.line) \
+                    for diagnostic in error.exception.diagnostics
+            ],
+            [('duplicate-import', 4), ('duplicate-alias', 5),
+             ('duplicate-import', 6)]
+        )
+
+    def test_get_edit_script(self):
+        file_lines = ['# Код', '', '', 'import os', 'import sys', 'x = 1']
+        edit_script = linter._get_edit_script(
+            file_lines,
+            ['import os', 'import sys'],
+            3,
+            5
+        )
+        self.assertEqual(
+            edit_script,
+            [(1, 2, []), (3, 5, ['import os', 'import sys']), (5, 5, ['', ''])]
+        )
+        self.assertEqual(
+            linter._apply_edit_script(file_lines, edit_script),
+            ['# Код', '', 'import os', 'import sys', '', '', 'x = 1']
+        )
+
+    def test_get_import_lines_with_indices_and_comments_bounds(self):
+        file_lines = ['# Код', '', 'import os', '# Импорт', 'import sys']
+        result = linter.get_import_lines_with_indices_and_comments(file_lines)
+        self.assertEqual(result[1:], (2, 5))
+        file_lines = ['import os', '# Начало кода', 'x = 1', 'import sys']
+        result = linter.get_import_lines_with_indices_and_comments(file_lines)
+        self.assertEqual(result[1:], (0, 1))
+        file_lines = ['"""Документация"""', 'import os']
+        result = linter.get_import_lines_with_indices_and_comments(file_lines)
+        self.assertIsNone(result)
+
+    def test_get_import_lines_with_indices_and_comments_commentaries(self):
+        file_lines = ['import os', '# Первый', '', '# Второй', 'import re']
+        import_lines, _, _ = \
+            linter.get_import_lines_with_indices_and_comments(file_lines)
+        self.assertEqual(
+            [
+                import_line['full_line_commentaries'] \
+                    for import_line in import_lines
+            ],
+            [[], ['# Первый', '# Второй']]
+        )
+
+    def test_lint_source(self):
+        for test_file in self.test_files:
+            source = linter.open_file(test_file['test_input_file'])
+            result = linter.lint_source(source, imports=True)
+            output_source = linter.open_file(test_file['test_output_file'])
+            self.assertEqual(result.source, output_source)
+            self.assertEqual(result.is_changed, source != output_source)
+            self.assertEqual(linter.fix_imports(source), output_source)
+        result = linter.lint_source(
+            'x = 1\n' + 'y = "' + 'z' * 80 + '"\n',
+            imports=True,
+            max_line_length=79
+        )
+        self.assertEqual(
+            [(diagnostic.rule, diagnostic.line) \
+                for diagnostic in result.diagnostics],
+            [('line-length', 2), ('no-import-section', None)]
+        )
+        self.assertFalse(result.is_changed)
+        result = linter.lint_source('import os\nimport os, re\n', True)
+        self.assertEqual(result.diagnostics[0].line, 2)
+        with self.assertRaises(linter.LinterError):
+            linter.fix_imports('import os\nimport os\n')
+        self.assertEqual(
+            linter.fix_imports('import sys\nimport os\n'),
+            'import os\nimport sys\n'
+        )
+
+    def test_import_time(self):
+        result = subprocess.run(
+            [
+                sys.executable,
+                '-c',
+                'import sys, linter; print(" ".join(sys.modules))'
+            ],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        imported_modules = result.stdout.split()
+        for module in ('argparse', 'concurrent.futures', 'sqlite3'):
+            self.assertNotIn(module, imported_modules)
+
+    def test_language_server(self):
+        def get_message(message):
+            body = json.dumps(message).encode('utf-8')
+            return b'Content-Length: %d\r\n\r\n' % len(body) + body
+
+        uri = 'file:///module.py'
+        messages = (
+            {'jsonrpc': '2.0', 'id': 1, 'method': 'initialize', 'params': {}},
+            {
+                'jsonrpc': '2.0',
+                'method': 'textDocument/didOpen',
+                'params': {
+                    'textDocument': {
+                        'uri': uri,
+                        'text': 'import sys\nimport os\n\n\nx = "' + \
+                            'z' * 80 + '"\n'
+                    }
+                }
+            },
+            {
+                'jsonrpc': '2.0',
+                'id': 2,
+                'method': 'textDocument/formatting',
+                'params': {'textDocument': {'uri': uri}}
+            },
+            {'jsonrpc': '2.0', 'id': 3, 'method': 'unknown'},
+            {'jsonrpc': '2.0', 'id': 4, 'method': 'shutdown'},
+            {'jsonrpc': '2.0', 'method': 'exit'}
+        )
+        input_stream = io.BytesIO(
+            b''.join(get_message(message) for message in messages)
+        )
+        output_stream = io.BytesIO()
+        server = linter.LanguageServer(input_stream, output_stream, True, 79)
+        server.serve()
+        output_stream.seek(0)
+        client = linter.LanguageServer(output_stream, None)
+        responses = []
+        while message := client.read_message():
+            responses.append(message)
+        capabilities = responses[0]['result']['capabilities']
+        self.assertTrue(capabilities['documentFormattingProvider'])
+        self.assertEqual(
+            [
+                (diagnostic['code'], diagnostic['range']['start']['line']) \
+                    for diagnostic in responses[1]['params']['diagnostics']
+            ],
+            [('line-length', 4), ('import-order', 0)]
+        )
+        self.assertEqual(
+            responses[2]['result'][0]['newText'],
+            'import os\nimport sys\n\n\nx = "' + 'z' * 80 + '"\n'
+        )
+        self.assertEqual(responses[3]['error']['code'], -32601)
+        self.assertIsNone(responses[4]['result'])
+        # Сообщения без "Content-Length" и с неправильным JSON пропускаются
+        input_stream = io.BytesIO(
+            b'Content-Length: 5\r\n\r\n{"id"'
+            b'Content-Type: text\r\n\r\n' + get_message(messages[0])
+        )
+        output_stream = io.BytesIO()
+        linter.LanguageServer(input_stream, output_stream).serve()
+        output_stream.seek(0)
+        client = linter.LanguageServer(output_stream, None)
+        responses = []
+        while message := client.read_message():
+            responses.append(message)
+        self.assertEqual(
+            [response.get('error', {}).get('code') for response in responses],
+            [-32700, -32700, None]
+        )
+        self.assertIn('capabilities', responses[2]['result'])
+
+    def test_watch(self):
+        with tempfile.TemporaryDirectory() as temp_directory:
+            filepath = os.path.join(temp_directory, 'module.py')
+            with open(filepath, 'w', encoding='utf-8') as file:
+                file.write('import sys\nimport os\n')
+            changes = linter.watch(
+                [temp_directory],
+                imports=True,
+                interval=0.01,
+                debounce=0.05
+            )
+            results = []
+            watcher = threading.Thread(
+                target=lambda: results.append(next(changes)),
+                daemon=True
+            )
+            watcher.start()
+            time.sleep(0.2)
+            for contents in ('import sys\n', 'import sys\nimport os\n'):
+                with open(filepath, 'w', encoding='utf-8') as file:
+                    file.write(contents)
+            watcher.join(5)
+            self.assertEqual(results, [[(filepath, [])]])
+            with open(filepath, 'r', encoding='utf-8') as file:
+                self.assertEqual(file.read(), 'import os\nimport sys\n')
+        with mock.patch.object(sys, 'stderr', io.StringIO()) as stderr:
+            with self.assertRaises(SystemExit):
+                linter.main(['--watch', '--staged'])
+        self.assertIn('недоступен с', stderr.getvalue())
+
+    def test_get_changed_lines(self):
+        long_line = 'x = "' + 'x' * 80 + '"'
+        with tempfile.TemporaryDirectory() as temp_directory:
+            current_directory = os.getcwd()
+            os.chdir(temp_directory)
+            try:
+                git = ['git', '-c', 'user.name=Test', '-c', 'user.email=t@t']
+                subprocess.run(git + ['init', '-q'], check=True)
+                with open('module.py', 'w', encoding='utf-8') as file:
+                    file.write(f'import sys\nimport os\n\n\n{long_line}\n')
+                subprocess.run(git + ['add', '.'], check=True)
+                subprocess.run(git + ['commit', '-qm', 'init'], check=True)
+                with open('module.py', 'a', encoding='utf-8') as file:
+                    file.write(f'y = 1\n{long_line}\n')
+                with open('new.py', 'w', encoding='utf-8') as file:
+                    file.write('import os\n')
+                self.assertEqual(
+                    linter.get_changed_lines(ref='HEAD'),
+                    {'module.py': [(6, 7)], 'new.py': None}
+                )
+                self.assertEqual(linter.get_changed_lines(staged=True), {})
+                changed_lines = linter.get_changed_lines(['module.py'])
+                result = linter.lint_files(
+                    sorted(changed_lines),
+                    imports=True,
+                    max_line_length=79,
+                    changed_lines=changed_lines
+                )
+                self.assertEqual(
+                    [diagnostic.line for diagnostic in result[0][1]],
+                    [7]
+                )
+                with open('module.py', 'r', encoding='utf-8') as file:
+                    self.assertTrue(file.read().startswith('import sys'))
+                # Строки подготовленных изменений сдвигаются на изменения, 
+                # ещё не подготовленные к коммиту
+                subprocess.run(git + ['add', 'module.py'], check=True)
+                with open('module.py', 'r+', encoding='utf-8') as file:
+                    contents = file.read()
+                    file.seek(0)
+                    file.write('# 1\n# 2\n# 3\n' + contents)
+                self.assertEqual(
+                    linter.get_changed_lines(staged=True),
+                    {'module.py': [(9, 10)]}
+                )
+                # git экранирует пути с пробелами и кавычками
+                filepaths = ['sp ace.py', 'qu"ote.py', 'new "file".py']
+                for filepath in filepaths[:2]:
+                    with open(filepath, 'w', encoding='utf-8') as file:
+                        file.write('x = 1\n')
+                subprocess.run(git + ['add', *filepaths[:2]], check=True)
+                subprocess.run(git + ['commit', '-qm', 'paths'], check=True)
+                for filepath in filepaths:
+                    with open(filepath, 'a', encoding='utf-8') as file:
+                        file.write('y = 2\n')
+                self.assertEqual(
+                    linter.get_changed_lines(filepaths),
+                    {
+                        'sp ace.py': [(2, 2)],
+                        'qu"ote.py': [(2, 2)],
+                        'new "file".py': None
+                    }
+                )
+            finally:
+                os.chdir(current_directory)
+
+    def test_benchmark(self):
+        source = benchmark.generate_source(
+            imports=6,
+            comment_lines=1,
+            names_per_line=2,
+            modules_per_line=2,
+            code_lines=5
+        )
+        fixed_source = linter.fix_imports(source)
+        self.assertNotEqual(fixed_source, source)
+        self.assertEqual(linter.fix_imports(fixed_source), fixed_source)
+        timings = benchmark.run_dimension('names', scale=0.1, repeats=1)
+        self.assertIn('reorganize', timings)
+        self.assertEqual(len(timings['reorganize']), len(benchmark.SCALES))
+        quadratic_results = {'names': {'reorganize': [0.001, 0.004, 0.016]}}
+        self.assertEqual(len(benchmark.check_results(quadratic_results, 3)), 1)
+        self.assertEqual(
+            benchmark.check_results(
+                {'names': {'reorganize': [0.001, 0.002, 0.004]}},
+                3,
+                {'names': {'reorganize': 0.002}}
+            ),
+            [
+                'names/reorganize: 4.00 мс вместо 2.00 мс по базовым замерам'
+            ]
+        )
+
+    def test_lint_files_profile(self):
+        with tempfile.TemporaryDirectory() as temp_directory:
+            filepath = os.path.join(temp_directory, 'module.py')
+            with open(filepath, 'w', encoding='utf-8') as file:
+                file.write('import sys\nimport os\nimport sys_module_123\n')
+            profile = linter.Profile()
+            linter.lint_files(
+                [filepath],
+                imports=True,
+                max_line_length=79,
+                profile=profile
+            )
+            profile_dict = profile.to_dict()
+            self.assertEqual(list(profile_dict['files']), [filepath])
+            # Без файла профиль не смешивается с отчётом в формате JSON
+            with mock.patch.object(sys, 'stdout', io.StringIO()) as stdout, \
+                mock.patch.object(sys, 'stderr', io.StringIO()) as stderr:
+                linter.main([
+                    '--profile',
+                    '--format',
+                    'json',
+                    '-ll',
+                    '5',
+                    '--no-cache',
+                    filepath
+                ])
+            self.assertEqual(
+                [
+                    json.loads(line)['rule'] \
+                        for line in stdout.getvalue().splitlines()
+                ],
+                ['line-length'] * 3
+            )
+            self.assertIn('files', json.loads(stderr.getvalue()))
+            self.assertEqual(
+                list(profile_dict['files'][filepath]),
+                [
+                    'read',
+                    'split',
+                    'line_length',
+                    'verify',
+                    'section',
+                    'parse',
+                    'duplicates',
+                    'reorder',
+                    'classify',
+                    'spacing',
+                    'write'
+                ]
+            )
+            self.assertEqual(
+                profile_dict['module_classification']['calls'],
+                3
+            )
+            self.assertEqual(profile_dict['total']['read']['calls'], 1)
+            self.assertGreater(
+                profile_dict['total']['read']['peak_memory'],
+                0
+            )
+
+    def test_reporter(self):
+        results = [
+            (
+                'module.py',
+                [linter.Diagnostic('line-length', 40, 3, 'Строка 3: "x"')]
+            ),
+            ('other.py', [])
+        ]
+        stream = io.StringIO()
+        reporter = linter.Reporter('text', stream, max_line_length=79)
+        reporter.add_results(results)
+        reporter.flush()
+        self.assertEqual(
+            stream.getvalue().splitlines(),
+            [
+                'Файл: module.py',
+                'Проверка, есть ли строки, которые содержат более 79 знаков',
+                'Строка 3: "x"',
+                'Файл: other.py',
+                'Проверка, есть ли строки, которые содержат более 79 знаков'
+            ]
+        )
+        stream = io.StringIO()
+        reporter = linter.Reporter('json', stream)
+        reporter.add_results(results)
+        reporter.flush()
+        self.assertEqual(
+            [json.loads(line) for line in stream.getvalue().splitlines()],
+            [{
+                'path': 'module.py',
+                'rule': 'line-length',
+                'level': 'error',
+                'line': 3,
+                'message': 'Строка 3: "x"'
+            }]
+        )
+        stream = io.StringIO()
+        reporter = linter.Reporter('sarif', stream)
+        reporter.add_results(results)
+        reporter.flush()
+        sarif_results = json.loads(stream.getvalue())['runs'][0]['results']
+        self.assertEqual(len(sarif_results), 1)
+        self.assertEqual(
+            sarif_results[0]['locations'][0]['physicalLocation']['region'],
+            {'startLine': 3}
+        )
+
+    def test_lint_file_modes(self):
+        with tempfile.TemporaryDirectory() as temp_directory:
+            filepath = os.path.join(temp_directory, 'module.py')
+            source = 'import sys\nimport os\n\n\nprint(os.sep, sys.path)\n'
+            with open(filepath, 'w', encoding='utf-8') as file:
+                file.write(source)
+            os.chmod(filepath, 0o640)
+            os.utime(filepath, ns=(0, 0))
+            diagnostics = linter.lint_file(filepath, imports=True, mode='diff')
+            self.assertEqual(
+                diagnostics[0].message.splitlines(),
+                [
+                    f'--- a/{filepath}',
+                    f'+++ b/{filepath}',
+                    '@@ -1,5 +1,5 @@',
+                    '-import sys',
+                    '-import os',
+                    '+import os',
+                    '+import sys',
+                    ' ',
+                    ' ',
+                    ' print(os.sep, sys.path)'
+                ]
+            )
+            self.assertEqual(
+                linter.lint_file(filepath, imports=True, mode='check'),
+                [linter.Diagnostic(
+                    'import-order',
+                    30,
+                    1,
+                    'Раздел импортов не соответствует PEP8'
+                )]
+            )
+            self.assertEqual(os.stat(filepath).st_mtime_ns, 0)
+            self.assertEqual(linter.lint_file(filepath, imports=True), [])
+            self.assertNotEqual(os.stat(filepath).st_mtime_ns, 0)
+            self.assertEqual(os.stat(filepath).st_mode & 0o777, 0o640)
+            self.assertEqual(os.listdir(temp_directory), ['module.py'])
+            os.utime(filepath, ns=(0, 0))
+            self.assertEqual(linter.lint_file(filepath, imports=True), [])
+            self.assertEqual(os.stat(filepath).st_mtime_ns, 0)
+            # Изменения одинаковых файлов из кэша содержат путь своего файла
+            results_cache = linter.ResultsCache(
+                os.path.join(temp_directory, 'cache')
+            )
+            for name in ('a.py', 'b.py'):
+                other_filepath = os.path.join(temp_directory, name)
+                with open(other_filepath, 'w', encoding='utf-8') as file:
+                    file.write(source)
+                diagnostics = linter.lint_file(
+                    other_filepath,
+                    imports=True,
+                    results_cache=results_cache,
+                    mode='diff'
+                )
+                results_cache.flush()
+                self.assertIn(
+                    f'--- a/{other_filepath}',
+                    diagnostics[0].message
+                )
+            results_cache.close()
+
+    def test_lint_stream(self):
+        source = 'import sys\nimport os\n\n\nprint(os.sep, sys.path)\n'
+        output_stream = io.BytesIO()
+        with mock.patch.object(sys, 'stderr', io.StringIO()) as stderr:
+            is_changed = linter._lint_stream(
+                io.BytesIO(source.encode('utf-8')),
+                output_stream,
+                imports=True,
+                max_line_length=79
+            )
+        self.assertTrue(is_changed)
+        self.assertEqual(
+            output_stream.getvalue().decode('utf-8'),
+            linter.fix_imports(source)
+        )
+        self.assertEqual(
+            stderr.getvalue(),
+            'Проверка, есть ли строки, которые содержат более 79 знаков\n'
+        )
+        output_stream = io.BytesIO()
+        linter._lint_stream(
+            io.BytesIO(source.encode('utf-8')),
+            output_stream,
+            imports=True,
+            max_line_length=None,
+            mode='check',
+            output_format='json'
+        )
+        self.assertEqual(
+            json.loads(output_stream.getvalue())['rule'],
+            'import-order'
+        )
+
+    def test_get_import_records(self):
+        import_records = linter._get_import_records([
+            {
+                'import_line': 'from os import sep, path as p  # from',
+                'line_index': 1,
+                'full_line_commentaries': ['# Комментарий']
+            },
+            {
+                'import_line': 'import os.path  # from',
+                'line_index': 2,
+                'full_line_commentaries': []
+            },
+            {
+                'import_line': 'import os',
+                'line_index': 3,
+                'full_line_commentaries': []
+            }
+        ])
+        self.assertEqual(
+            import_records[0],
+            linter.ImportRecord(
+                'from os import sep, path as p  # from',
+                1,
+                'from os import path as p, sep  # from',
+                'os',
+                ['# Комментарий'],
+                (('path', 'p'), ('sep', None)),
+                'os',
+                '  # from',
+                True,
+                ('os', True, 'path')
+            )
+        )
+        self.assertEqual(
+            linter._reorganize_order(import_records),
+            [
+                'import os',
+                'import os.path  # from',
+                '# Комментарий',
+                'from os import path as p, sep  # from'
+            ]
+        )
+
+    def test_lint_file_reads_import_header(self):
+        with tempfile.TemporaryDirectory() as temp_directory:
+            filepath = os.path.join(temp_directory, 'module.py')
+            tail = b'print(os.sep, sys.path)\n\x0c\n# \xff\n'
+            with open(filepath, 'wb') as file:
+                file.write(b'import sys\nimport os\nx = 1\n' + tail)
+            self.assertEqual(
+                linter._read_import_header(filepath),
+                ('import sys\nimport os\nx = 1\n', 27)
+            )
+            self.assertEqual(linter.lint_file(filepath, imports=True), [])
+            with open(filepath, 'rb') as file:
+                self.assertEqual(
+                    file.read(),
+                    b'import os\nimport sys\n\n\nx = 1\n' + tail
+                )
+
+    def test_module_index(self):
+        with tempfile.TemporaryDirectory() as temp_directory:
+            site_packages = os.path.join(
+                temp_directory,
+                'venv',
+                'lib',
+                'python3.13',
+                'site-packages'
+            )
+            dist_info = os.path.join(site_packages, 'package-1.0.dist-info')
+            os.makedirs(dist_info)
+            with open(os.path.join(dist_info, 'METADATA'), 'w') as file:
+                file.write('Metadata-Version: 2.1\nName: package\n')
+            with open(os.path.join(dist_info, 'RECORD'), 'w') as file:
+                file.write('editable_package/__init__.py,,\n')
+            with open(os.path.join(site_packages, 'single.py'), 'w') as file:
+                file.write('')
+            source_root = os.path.join(temp_directory, 'src')
+            os.makedirs(os.path.join(source_root, 'single'))
+            module_index = linter.ModuleIndex.from_environment(
+                os.path.join(temp_directory, 'venv'),
+                [source_root]
+            )
+            self.assertEqual(
+                [
+                    module_index.classify(module_name) for module_name \
+                        in ('os', 'editable_package', 'single', 'unknown')
+                ],
+                ['standard', 'third_party', 'local', 'local']
+            )
+            with self.assertRaises(ValueError):
+                linter.ModuleIndex.from_environment(source_root)
+
+    def test_rule_engine(self):
+        source = (
+            'import sys\n'
+            'import os\n'
+            '\n'
+            '\n'
+            f'value = "{"x" * 80}"\n'
+            'other = 1\n'
+        )
+        engine = linter.RuleEngine(
+            [linter.LineLengthRule(79), linter.ImportOrderRule()]
+        )
+        self.assertEqual(
+            engine.run(source),
+            linter.lint_source(source, imports=True, max_line_length=79)
+        )
+        result = engine.run(source)
+        self.assertEqual(
+            [diagnostic.rule for diagnostic in result.diagnostics],
+            ['line-length']
+        )
+        self.assertTrue(result.source.startswith('import os\nimport sys\n'))
+        self.assertEqual(
+            engine.run(source, [(6, 6)]),
+            linter.Result([], source, False)
+        )
+        self.assertEqual(
+            sorted(linter.RULES),
+            ['import-order', 'line-length']
+        )
+        linter._active_profile = profile = linter.Profile(trace_memory=False)
+        try:
+            linter.RuleEngine([linter.LineLengthRule(79)]).run(source)
+        finally:
+            linter._active_profile = None
+        self.assertEqual(profile.to_dict()['rules']['line-length']['calls'], 6)
+
+    def test_custom_rules(self):
+        section_bounds = []
+
+        class TodoRule(linter.Rule):
+            name = 'todo'
+
+            def check_line(self, line_number, line):
+                if 'TODO' in line:
+                    return linter.Diagnostic('todo', 30, line_number, line)
+
+        class SectionRule(linter.Rule):
+            name = 'section'
+
+            def check_import_section(self, file_lines, import_section_bounds):
+                section_bounds.append(import_section_bounds)
+                return [], None
+
+        source = '# c\n\n\nimport sys\nimport os\nx = 1  # TODO\n'
+        result = linter.lint_source(
+            source,
+            imports=True,
+            rules=[TodoRule(), SectionRule()]
+        )
+        self.assertEqual(
+            result.diagnostics,
+            [linter.Diagnostic('todo', 30, 6, 'x = 1  # TODO')]
+        )
+        self.assertEqual(section_bounds, [(2, 4)])
+        with tempfile.TemporaryDirectory() as temp_directory:
+            filepath = os.path.join(temp_directory, 'module.py')
+            with open(filepath, 'w', encoding='utf-8') as file:
+                file.write(source)
+            with mock.patch.dict(linter.RULES, {'todo': TodoRule}), \
+                mock.patch.object(sys, 'stdout', io.StringIO()) as stdout:
+                linter.main(
+                    ['--select', 'todo,import-order', '--no-cache', filepath]
+                )
+            self.assertIn('x = 1  # TODO', stdout.getvalue())
+            with open(filepath, 'r', encoding='utf-8') as file:
+                self.assertEqual(file.read(), result.source)
+
+    def test_get_shard(self):
+        with tempfile.TemporaryDirectory() as temp_directory:
+            filepaths = []
+            for idx, size in enumerate((900, 500, 400, 300, 200, 0, 0)):
+                filepath = os.path.join(temp_directory, f'module_{idx}.py')
+                with open(filepath, 'w', encoding='utf-8') as file:
+                    file.write('x' * size)
+                filepaths.append(filepath)
+            shards = [linter.get_shard(filepaths, idx, 2) for idx in (1, 2)]
+            self.assertEqual(
+                sorted(shards[0] + shards[1]),
+                sorted(filepaths)
+            )
+            self.assertEqual(
+                [os.path.getsize(filepath) for filepath in shards[0]],
+                [900, 300]
+            )
+            self.assertEqual(
+                linter.get_shard(list(reversed(filepaths)), 2, 2),
+                shards[1]
+            )
+
+    def test_merge_reports(self):
+        with tempfile.TemporaryDirectory() as temp_directory:
+            report_filepaths = []
+            for filepath, rule in (('b.py', 'import-order'), ('a.py', 'x')):
+                report_filepath = os.path.join(
+                    temp_directory,
+                    f'{filepath}.json'
+                )
+                with open(report_filepath, 'w', encoding='utf-8') as file:
+                    reporter = linter.Reporter('json', file)
+                    reporter.add_results([(
+                        filepath,
+                        [linter.Diagnostic(rule, 40, 1, 'Сообщение')]
+                    )])
+                    reporter.flush()
+                report_filepaths.append(report_filepath)
+            self.assertEqual(
+                linter.merge_reports(report_filepaths),
+                [
+                    ('a.py', [linter.Diagnostic('x', 40, 1, 'Сообщение')]),
+                    (
+                        'b.py',
+                        [linter.Diagnostic('import-order', 40, 1, 'Сообщение')]
+                    )
+                ]
+            )
+            with mock.patch.object(sys, 'stdout', io.StringIO()) as stdout:
+                with self.assertRaises(SystemExit):
+                    linter.main(['--check', '--merge', *report_filepaths])
+            self.assertIn('Файл: b.py', stdout.getvalue())
+            with mock.patch.object(sys, 'stdout', io.StringIO()) as stdout:
+                linter.main(['-ll', '79', '--merge', report_filepaths[1]])
+            self.assertIn('более 79 знаков', stdout.getvalue())
+
+    def test_imports_memo(self):
+        imports_memo = linter.ImportsMemo(max_entries=1)
+        header = 'import sys\nimport os\n'
+        with mock.patch.object(linter, '_imports_memo', imports_memo):
+            first = linter.lint_source(header + '\nx = 1\n', True)
+            second = linter.lint_source('import sys\n\nimport os\n', True)
+            self.assertEqual(
+                first.source,
+                'import os\nimport sys\n\n\nx = 1\n'
+            )
+            self.assertEqual(second.source, 'import os\nimport sys\n')
+            self.assertEqual((imports_memo.hits, imports_memo.misses), (1, 1))
+            linter.lint_source('import json\n', True)
+            self.assertEqual(len(imports_memo.entries), 1)
+            with tempfile.TemporaryDirectory() as temp_directory:
+                for _ in range(2):
+                    imports_memo.entries = {}
+                    imports_memo.results_cache = \
+                        linter.ResultsCache(temp_directory)
+                    result = linter.lint_source(header, True)
+                    imports_memo.results_cache.flush()
+                    imports_memo.results_cache.close()
+            self.assertEqual(result.source, 'import os\nimport sys\n')
+            self.assertEqual(imports_memo.disk_hits, 1)
+
+    def test_lint_files_pipeline(self):
+        sources = [
+            'import sys\nimport os\n\n\nvalue = 1\n',
+            f'import os\n\n\nvalue = "{"x" * 80}"\r\n',
+            'import sys\r\nimport os\r\n'
+        ]
+        with tempfile.TemporaryDirectory() as temp_directory:
+            filepaths = [
+                os.path.join(temp_directory, f'module_{idx}.py') \
+                    for idx in range(len(sources))
+            ]
+            filepaths.append(os.path.join(temp_directory, 'missing.py'))
+
+            def lint(lint_files, mode, **kwargs):
+                for filepath, source in zip(filepaths, sources):
+                    with open(filepath, 'w', newline='') as file:
+                        file.write(source)
+                results = lint_files(
+                    filepaths,
+                    imports=True,
+                    max_line_length=79,
+                    mode=mode,
+                    **kwargs
+                )
+                contents = []
+                for filepath in filepaths[:-1]:
+                    with open(filepath, 'rb') as file:
+                        contents.append(file.read())
+                return results, contents
+
+            for mode in ('check', 'write'):
+                self.assertEqual(
+                    lint(
+                        linter.lint_files_pipeline,
+                        mode,
+                        jobs=2,
+                        max_in_flight=2
+                    ),
+                    lint(linter.lint_files, mode, jobs=1)
+                )
+
+    def test_is_import_section_sorted(self):
+        source = (
+            'import os  # Комментарий\n'
+            'from os import path, sep\n'
+            'import sys\n'
+            '\n'
+            '# Локальный модуль\n'
+            'import sys_module_123\n'
+            '\n'
+            '\n'
+            'value = 1\n'
+        )
+        with mock.patch.object(
+            linter,
+            'update_import_lines',
+            side_effect=AssertionError
+        ):
+            self.assertEqual(
+                linter.lint_source(source, imports=True),
+                linter.Result([], source, False)
+            )
+        file_lines = linter.get_file_lines(source)
+        for idx, line in (
+            (0, 'import os # Комментарий'),
+            (1, 'from os import sep, path'),
+            (2, 'import sys, os'),
+            (3, ''),
+            (3, 'import sys_module_123'),
+            (5, 'import sys')
+        ):
+            changed_file_lines = list(file_lines)
+            if line:
+                changed_file_lines[idx] = line
+            else:
+                del changed_file_lines[idx]
+            self.assertFalse(
+                linter._is_import_section_sorted(changed_file_lines, 0, 6)
+            )
+
+    def test_lint_files_read_errors(self):
+        with tempfile.TemporaryDirectory() as temp_directory:
+            bad_filepath = os.path.join(temp_directory, 'bad.py')
+            good_filepath = os.path.join(temp_directory, 'good.py')
+            with open(bad_filepath, 'wb') as file:
+                file.write(b'import sys\nimport os\n# \xff\n')
+            with open(good_filepath, 'w', encoding='utf-8') as file:
+                file.write('import sys\nimport os\n')
+            for lint_files in (linter.lint_files, linter.lint_files_pipeline):
+                results = dict(lint_files(
+                    [bad_filepath, good_filepath],
+                    imports=True,
+                    jobs=2,
+                    mode='check'
+                ))
+                self.assertEqual(
+                    [
+                        diagnostic.rule \
+                            for diagnostic in results[bad_filepath]
+                    ],
+                    ['file-read-error']
+                )
+                self.assertEqual(
+                    [
+                        diagnostic.rule \
+                            for diagnostic in results[good_filepath]
+                    ],
+                    ['import-order']
+                )
\ No newline at end of file